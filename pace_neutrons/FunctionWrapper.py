@@ -1,62 +1,216 @@
-import uuid
+import sys
 import numpy as np
 import libpymcr
 
-_globalObjectsDict = {}
+# Python objects created from Matlab (see pyclasswrapper.m) are kept in the slots of this table
+# and referred to by handles '<typename>#<slot>#<generation>'. The generation of a slot is
+# incremented when its object is removed, so handles of removed objects are detected even
+# once the slot has been reused.
+_objectSlots = [None] * 64
+_objectGenerations = [0] * 64
+_freeObjectSlots = list(range(63, -1, -1))
+_objectStats = {'created': 0, 'removed': 0, 'stale': 0}
+# The methods of each object (by slot) which Matlab has called, bound once and
+# dropped when the object is removed
+_boundMethods = {}
+
+def _object_slot(object_string):
+    try:
+        _, slot, generation = object_string.rsplit('#', 2)
+        slot, generation = int(slot), int(generation)
+    except (AttributeError, ValueError):
+        raise KeyError(f'{object_string!r} is not a Python object handle') from None
+    if slot >= len(_objectSlots) or _objectGenerations[slot] != generation or _objectSlots[slot] is None:
+        _objectStats['stale'] += 1
+        raise KeyError(f'The Python object {object_string} has been removed')
+    return slot
+
+def add_object(obj, typename='pyobj'):
+    if not _freeObjectSlots:
+        # Doubles the table, keeping the lowest free slot at the end of the free list
+        n_slots = len(_objectSlots)
+        _objectSlots.extend([None] * n_slots)
+        _objectGenerations.extend([0] * n_slots)
+        _freeObjectSlots.extend(range(2 * n_slots - 1, n_slots - 1, -1))
+    slot = _freeObjectSlots.pop()
+    _objectSlots[slot] = obj
+    _objectStats['created'] += 1
+    return f'{typename}#{slot}#{_objectGenerations[slot]}'
+
+def get_object(object_string):
+    return _objectSlots[_object_slot(object_string)]
 
 def remove_object(object_string):
-    _globalObjectsDict.pop(object_string, None)
+    try:
+        slot = _object_slot(object_string)
+    except KeyError:
+        return
+    _objectSlots[slot] = None
+    _boundMethods.pop(slot, None)
+    _objectGenerations[slot] += 1
+    _freeObjectSlots.append(slot)
+    _objectStats['removed'] += 1
+
+def remove_objects(*object_strings):
+    # Removes several objects at once, or all of them if none are given
+    if not object_strings:
+        object_strings = [f'#{slot}#{_objectGenerations[slot]}' for slot, obj in enumerate(_objectSlots)
+                          if obj is not None]
+    for object_string in object_strings:
+        remove_object(object_string)
+
+def _object_bytes(obj):
+    # Numpy arrays (and objects which report their size similarly) give the size of their data
+    nbytes = getattr(obj, 'nbytes', None)
+    return nbytes if isinstance(nbytes, (int, np.integer)) else sys.getsizeof(obj)
+
+def stats():
+    """
+    The number of live Python objects created from Matlab, the (approximate) bytes they hold,
+    the size of the object table, and the number of objects created and removed so far and of
+    lookups of handles of removed objects
+    """
+    live = [obj for obj in _objectSlots if obj is not None]
+    return dict(_objectStats, live=len(live), bytes=int(sum(_object_bytes(obj) for obj in live)),
+                slots=len(_objectSlots))
 
 def get_obj_prop(object_string, prop_name):
-    return getattr(_globalObjectsDict[object_string], prop_name)
+    return getattr(get_object(object_string), prop_name)
+
+def get_obj_props(object_string, *prop_names):
+    # Several properties at once, as a dict (a struct in Matlab)
+    obj = get_object(object_string)
+    return {name: getattr(obj, name) for name in prop_names}
+
+# The properties declared immutable for each typename by WrappedPythonClass
+_immutableProperties = {}
+
+def get_obj_immutable(object_string):
+    # The properties which Matlab may cache (see pyclasswrapper.m), declared for the typename
+    # of the object or by its class in a __pace_immutable__ attribute
+    names = set(_immutableProperties.get(object_string.rsplit('#', 2)[0], ()))
+    names.update(getattr(get_object(object_string), '__pace_immutable__', ()))
+    return sorted(names)
+
+def _bound_method(object_string, method_name):
+    slot = _object_slot(object_string)
+    methods = _boundMethods.setdefault(slot, {})
+    if method_name not in methods:
+        methods[method_name] = getattr(_objectSlots[slot], method_name)
+    return methods[method_name]
 
 def call_obj_method(object_string, method_name, *args, **kwargs):
-    return getattr(_globalObjectsDict[object_string], method_name)(*args, **kwargs)
+    return _bound_method(object_string, method_name)(*args, **kwargs)
+
+def call_obj_methods(object_string, *calls):
+    # Calls several methods of an object, each given as a list [method_name, *args]
+    # (a cell array in Matlab), and returns the list of their results
+    results = []
+    for call in calls:
+        method_name, *args = [call] if isinstance(call, str) else call
+        results.append(_bound_method(object_string, method_name)(*[_as_column(arg) for arg in args]))
+    return results
 
+def _is_row(arg):
+    return isinstance(arg, np.ndarray) and arg.ndim == 2 and arg.shape[0] == 1
+
+def _as_column(arg):
+    # A transposed view, so row vectors from Matlab are not copied
+    if _is_row(arg):
+        return arg.T
+    return arg
+
+def _resolve_objects(args, kwargs):
+    # Wrapped Python objects passed from Matlab arrive as {'pace_pyobj': handle} markers, at
+    # the positions and keywords listed in pace_pyobj_args and pace_pyobj_kwargs (see
+    # call_python_m in call.m). These are only present if there are such arguments.
+    positions = kwargs.pop('pace_pyobj_args', None)
+    if positions is None:
+        return args
+    args = list(args)
+    for idx in np.ravel(positions):
+        args[int(idx)] = get_object(args[int(idx)]['pace_pyobj'])
+    keywords = kwargs.pop('pace_pyobj_kwargs', ())
+    for key in ([keywords] if isinstance(keywords, str) else keywords):
+        kwargs[key] = get_object(kwargs[key]['pace_pyobj'])
+    return args
+
+def call_python_columns(function_name, *args, **kwargs):
+    # All calls from Matlab go through this function, which passes
+    # Matlab row vectors to the Python function as column vectors.
+    # The arguments are passed on as they are if there is nothing to convert.
+    if 'pace_pyobj_args' in kwargs:
+        args = _resolve_objects(args, kwargs)
+    if any(_is_row(arg) for arg in args):
+        args = [_as_column(arg) for arg in args]
+    if any(_is_row(val) for val in kwargs.values()):
+        kwargs = {ky: _as_column(val) for ky, val in kwargs.items()}
+    return libpymcr._globalFunctionDict[function_name](*args, **kwargs)
+
+libpymcr._globalFunctionDict['call_python_columns'] = call_python_columns
 libpymcr._globalFunctionDict['remove_object'] = remove_object
+libpymcr._globalFunctionDict['remove_objects'] = remove_objects
+libpymcr._globalFunctionDict['object_stats'] = stats
 libpymcr._globalFunctionDict['get_obj_prop'] = get_obj_prop
+libpymcr._globalFunctionDict['get_obj_props'] = get_obj_props
 libpymcr._globalFunctionDict['call_obj_method'] = call_obj_method
+libpymcr._globalFunctionDict['call_obj_methods'] = call_obj_methods
 
 
 class WrappedPythonClass(object):
-    def __init__(self, input_class, typename='pyobj'):
+    def __init__(self, input_class, typename='pyobj', immutable=()):
         self.target_class = input_class
         self.typename = typename
+        if immutable:
+            _immutableProperties[typename] = tuple(immutable)
 
     def __call__(self, *args, **kwargs):
-        args = [_globalObjectsDict[arg] if (isinstance(arg, str) and arg.startswith('pyobj')) else arg for arg in args]
-        kwargs = {ky:(_globalObjectsDict[val] if (isinstance(val, str) and val.startswith('pyobj')) else val) for ky, val in kwargs.items()}
-        input_object = self.target_class(*args, **kwargs)
-        obj_uuid = str(uuid.uuid4())
-        key_string = self.typename + obj_uuid
-        _globalObjectsDict[key_string] = input_object
-        return key_string
-
-try:
-    from brille.utils import create_bz, create_grid
-except ImportError:
-    pass
-else:
-    wrapped_create_bz = WrappedPythonClass(create_bz, 'pyobj_bz')
-    wrapped_create_grid = WrappedPythonClass(create_grid, 'pyobj_grid')
-    libpymcr._globalFunctionDict['create_bz'] = wrapped_create_bz
-    libpymcr._globalFunctionDict['create_grid'] = wrapped_create_grid
-    def brille_grid_fill(objstr, *args):
-        # We have to do the reshape here because Matlab swallows singleton dims
-        args = list(args)
-        for idx in ([0, 2, 3, 5] if len(args) > 5 else [0, 2]):
-            shp = np.shape(args[idx])
-            if len(shp) < 3:
-                args[idx] = np.reshape(args[idx], (shp[0], shp[1], 1))
-        for idx in ([1, 4] if len(args) > 5 else [1, 3]):
-            args[idx] = np.reshape(args[idx], (np.prod(np.shape(args[idx])),)).astype('int32')
-        if len(args) % 2 == 1:
-            args[-1] = args[-1][0]
-        return getattr(_globalObjectsDict[objstr], 'fill')(*args)
-    libpymcr._globalFunctionDict['brille_grid_fill'] = brille_grid_fill
-    def brille_ir_interpolate_at(objstr, *args):
-        # Again we can't transpose in Matlab because brille needs a C-style array
-        hkl = args[0] if np.shape(args[0])[1] == 3 else np.transpose(args[0])
-        kwargs = {args[idx]:args[idx+1] for idx in range(1, len(args), 2)} if len(args) > 1 else {}
-        return getattr(_globalObjectsDict[objstr], 'ir_interpolate_at')(hkl, **kwargs)
-    libpymcr._globalFunctionDict['brille_ir_interpolate_at'] = brille_ir_interpolate_at
+        # Wrapped objects passed as arguments have already been resolved by call_python_columns.
+        # Matlab receives the handle and the immutable properties as two outputs, so that the
+        # pyclasswrapper need not ask for the latter.
+        object_string = add_object(self.target_class(*args, **kwargs), self.typename)
+        return object_string, get_obj_immutable(object_string)
+
+# The brille functions are registered now but brille is only imported when
+# MATLAB first calls one of them, as importing it is slow
+_brilleFunctions = {}
+
+def _load_brille():
+    if not _brilleFunctions:
+        try:
+            from brille.utils import create_bz, create_grid
+        except ImportError as err:
+            raise RuntimeError('The brille Python module is required for this function') from err
+        _brilleFunctions['create_bz'] = WrappedPythonClass(create_bz, 'pyobj_bz')
+        _brilleFunctions['create_grid'] = WrappedPythonClass(create_grid, 'pyobj_grid')
+    return _brilleFunctions
+
+def create_bz(*args, **kwargs):
+    return _load_brille()['create_bz'](*args, **kwargs)
+
+def create_grid(*args, **kwargs):
+    return _load_brille()['create_grid'](*args, **kwargs)
+
+def brille_grid_fill(objstr, *args):
+    # We have to do the reshape here because Matlab swallows singleton dims
+    args = list(args)
+    for idx in ([0, 2, 3, 5] if len(args) > 5 else [0, 2]):
+        shp = np.shape(args[idx])
+        if len(shp) < 3:
+            args[idx] = np.reshape(args[idx], (shp[0], shp[1], 1))
+    for idx in ([1, 4] if len(args) > 5 else [1, 3]):
+        args[idx] = np.reshape(args[idx], (np.prod(np.shape(args[idx])),)).astype('int32')
+    if len(args) % 2 == 1:
+        args[-1] = args[-1][0]
+    return getattr(get_object(objstr), 'fill')(*args)
+
+def brille_ir_interpolate_at(objstr, *args):
+    # Again we can't transpose in Matlab because brille needs a C-style array
+    hkl = args[0] if np.shape(args[0])[1] == 3 else np.transpose(args[0])
+    kwargs = {args[idx]:args[idx+1] for idx in range(1, len(args), 2)} if len(args) > 1 else {}
+    return getattr(get_object(objstr), 'ir_interpolate_at')(hkl, **kwargs)
+
+libpymcr._globalFunctionDict['create_bz'] = create_bz
+libpymcr._globalFunctionDict['create_grid'] = create_grid
+libpymcr._globalFunctionDict['brille_grid_fill'] = brille_grid_fill
+libpymcr._globalFunctionDict['brille_ir_interpolate_at'] = brille_ir_interpolate_at
@@ -1,17 +1,11 @@
 from __future__ import annotations
 
-import os
 import sys
 import contextlib
+import importlib
 from pathlib import Path
-from typing import Optional
-import libpymcr
 
-
-from . import _version
-__version__ = _version.get_versions()['version']
-
-from . import FunctionWrapper
+from ._profiling import TIMER as _TIMER
 
 # Generate a list of all the MATLAB versions available
 _VERSION_DIR = Path(__file__).parent / "ctfs"
@@ -19,18 +13,43 @@ _VERSION_DIR = Path(__file__).parent / "ctfs"
 #check if the directory exists and adjust as needed
 #accounts for different dir when calling regularly and during release stages of CI
 if not _VERSION_DIR.is_dir():
-    _VERSION_DIR = next(Path("./build").glob("lib.*")) / "pace_neutrons" / "ctfs"
-
-def _getFiles(folder, test):
-    return [{'file': file.resolve(), 'version': file.stem.split('_')[1]}
-            for file in folder.iterdir() if test(file)]
-_VERSIONS = _getFiles(_VERSION_DIR, lambda f: f.is_file() and f.suffix == ".ctf")
-_NOMEXS = _getFiles(_VERSION_DIR, lambda f: f.is_file() and f.stem.startswith("nomex"))
+    _BUILD_DIR = next(Path("./build").glob("lib.*"), None)
+    if _BUILD_DIR is not None:
+        _VERSION_DIR = _BUILD_DIR / "pace_neutrons" / "ctfs"
+
+# The folder listing and the MATLAB locations are cached between sessions (see _discovery.py)
+from ._discovery import DiscoveryIndex
+_INDEX = DiscoveryIndex()
+
+def _getFiles(files, test):
+    return [{'file': file, 'version': file.stem.split('_')[1]}
+            for file in files if test(file)]
+with _TIMER.phase('list CTF files'):
+    _CTF_FILES = _INDEX.ctf_files(_VERSION_DIR)
+    _VERSIONS = _getFiles(_CTF_FILES, lambda f: f.suffix == ".ctf")
+    _NOMEXS = _getFiles(_CTF_FILES, lambda f: f.stem.startswith("nomex"))
+    _INDEX.save()
 _MATLABNOTFOUND_STR = f"No supported MATLAB versions [{', '.join(version['version'] for version in _NOMEXS)}] found.\n " \
     "If installed, please specify the root directory (`matlab_path` and `matlab_version`) of the MATLAB installation.\n " \
     "If not installed you can download the MCR from: https://uk.mathworks.com/products/compiler/matlab-runtime.html\n"
-VERSION = ''
-INITIALIZED = False
+
+# The MATLAB interface and the Python functions called from MATLAB need libpymcr, numpy and
+# (optionally) brille, so they are only imported when first used (see `__getattr__`)
+_LAZY_ATTRIBUTES = {
+    'Matlab': ('._matlab', 'Matlab'),
+    'MatlabFuture': ('._matlab', 'MatlabFuture'),
+    'MatlabBatchError': ('._batch', 'MatlabBatchError'),
+    'MatlabCancelled': ('._calls', 'MatlabCancelled'),
+    'MatlabTimeout': ('._calls', 'MatlabTimeout'),
+    'MatlabHandle': ('._calls', 'MatlabHandle'),
+    'FunctionWrapper': ('.FunctionWrapper', None),
+    'MatlabPool': ('._pool', 'MatlabPool'),
+    'MatlabBlob': ('._pool', 'MatlabBlob'),
+    'MatlabClient': ('._client', 'MatlabClient'),
+    'startup_report': ('._profiling', 'startup_report'),
+}
+# Startup state which is only defined once `_matlab` has been imported
+_MATLAB_STATE = {'INITIALIZED': False, 'VERSION': ''}
 
 
 class _DummyFile(object):
@@ -48,73 +67,46 @@ def nostdout():
     sys.stdout = save_stdout
 
 
-def _initialize_compiled_worker(interface):
-    import platform, shutil
-    worker_path = os.path.join(os.path.dirname(sys.argv[0]), 'worker_v4')
-    if platform.system() == 'Windows':
-        worker_path += '.exe'
-    if not os.path.exists(worker_path):
-        worker_path = shutil.which('worker_v4')
-    if worker_path:
-        so0 = sys.stdout
-        with nostdout():
-            pc = interface.call('parallel_config', nargout=1)
-            access = interface.call('substruct', '.', 'worker')
-            interface.call('subsasgn', pc, access, worker_path)
-
-
 def _checkML(versions):
-    from libpymcr.utils import checkPath
-    return [v for v in versions
-            if checkPath(f'R{v["version"]}', error_if_not_found=False, suppress_output=True) is not None]
-
-
-class Matlab(libpymcr.Matlab):
-
-    def __init__(self, matlab_path: Optional[str] = None, matlab_version: Optional[str] = None):
-        """
-        Create a MATLAB instance with the correct compiled library for the MATLAB version specified.
-        If no version is specified, the first version found will be used. If no MATLAB versions are 
-        found, a RuntimeError will be raised. If a version is specified, but not found, a RuntimeError
-        will be raised.
-
-        :param matlab_path: Path to the root directory of the MATLAB installation or MCR installation.
-        :param matlab_version: Used to specify the version of MATLAB if the matlab_path is given or if
-        there is more than 1 MATLAB installation.
-        """
-        from libpymcr.utils import recombinemex
-        global INITIALIZED
-        global VERSION
-
-        if INITIALIZED:
-            super().__init__(VERSION, mlPath=matlab_path)
-        elif matlab_version is None:
-            avail_ML = _checkML(_VERSIONS)
-            if avail_ML:
-                super().__init__(avail_ML[0]['file'], mlPath=matlab_path)
-            else:
-                avail_ML = _checkML(_NOMEXS)
-                if not avail_ML:
-                    raise RuntimeError(_MATLABNOTFOUND_STR)
-                for ver in avail_ML:
-                    print(f'Please wait... creating pace CTF for Matlab R{ver["version"]}')
-                    recombinemex(f'R{ver["version"]}', _VERSION_DIR)
-                ctffile = _VERSION_DIR / f'pace_{avail_ML[0]["version"]}.ctf'
-                super().__init__(ctffile.resolve(), mlPath=matlab_path)
-        else:
-            ctf = [v['file'] for v in _VERSIONS if v['version'].lower() == matlab_version.lower()]
-            nmx = [v for v in _NOMEXS if v['version'].lower() == matlab_version.lower()]
-            if not ctf and nmx:
-                recombinemex(f'R{nmx[0]["version"]}', _VERSION_DIR)
-                ctf = [(_VERSION_DIR / f'pace_{nmx[0]["version"]}.ctf').resolve()]
-            if len(ctf) == 0:
-                raise RuntimeError(
-                    f"Compiled library for MATLAB version {matlab_version} not found. "
-                    f"Please use: [{', '.join([version['version'] for version in _NOMEXS])}]\n ")
-            else:
-                ctf = ctf[0]
-            super().__init__(ctf, mlPath=matlab_path)
-        INITIALIZED = True
-        self._interface.call('pyhorace_init', nargout=0)
-        if 'worker' not in sys.argv[0]:
-            _initialize_compiled_worker(self._interface)
+    # Returns the versions with a MATLAB / MCR installation, with its root folder under 'root'
+    avail = [dict(v, root=_INDEX.matlab_root(v['version'])) for v in versions]
+    if not any(v['root'] for v in avail):
+        # A cached "not found" could be stale if MATLAB was installed since, so check again
+        avail = [dict(v, root=_INDEX.matlab_root(v['version'], use_negative=False)) for v in versions]
+    _INDEX.save()
+    return [v for v in avail if v['root'] is not None]
+
+
+def refresh_discovery():
+    """
+    Clears the cached CTF folder listing and MATLAB / MCR locations so they are
+    searched for again, e.g. after installing a new MATLAB runtime.
+    """
+    global _CTF_FILES, _VERSIONS, _NOMEXS
+    _INDEX.clear()
+    _CTF_FILES = _INDEX.ctf_files(_VERSION_DIR)
+    _VERSIONS = _getFiles(_CTF_FILES, lambda f: f.suffix == ".ctf")
+    _NOMEXS = _getFiles(_CTF_FILES, lambda f: f.stem.startswith("nomex"))
+    _INDEX.save()
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module_name, attribute = _LAZY_ATTRIBUTES[name]
+        module = importlib.import_module(module_name, __name__)
+        value = getattr(module, attribute) if attribute else module
+        globals()[name] = value
+        return value
+    if name in _MATLAB_STATE:
+        # Not cached as these change when MATLAB is started
+        matlab = sys.modules.get(f'{__name__}._matlab')
+        return getattr(matlab, name) if matlab is not None else _MATLAB_STATE[name]
+    if name == '__version__':
+        from . import _version
+        globals()['__version__'] = _version.get_versions()['version']
+        return globals()['__version__']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | set(_MATLAB_STATE) | {'__version__'})
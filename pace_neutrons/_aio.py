@@ -0,0 +1,73 @@
+"""
+An asyncio interface to MATLAB: ``await m.aio.<func>(...)``.
+
+The calls are run one at a time by the dispatcher thread, so the event loop stays
+responsive while e.g. a long ``cut_sqw`` runs. Cancelling the awaitable (e.g. with
+`asyncio.wait_for`) removes a call which has not started from the queue, or stops it
+from starting if it is waiting for the runtime, and cancels one which is running
+with `MatlabCall.cancel`. libpymcr only interrupts MATLAB on a signal in the main
+thread, so a call running on the dispatcher thread cannot be interrupted: it runs to
+completion (with a `RuntimeWarning`) before the next one starts.
+"""
+import asyncio
+import warnings
+import threading
+from ._calls import call_matlab, current_call, MatlabCancelled
+from ._dispatch import DISPATCHER
+
+
+def _call_unless_cancelled(cancelled, interface, name, args, kwargs, nargout):
+    # Runs once the dispatcher holds the runtime, which may be after the task was cancelled
+    if cancelled.is_set():
+        raise MatlabCancelled(f'MATLAB call {name} was cancelled')
+    return call_matlab(interface, name, args, kwargs, nargout)
+
+
+async def _result(name, future, cancelled):
+    try:
+        return await asyncio.shield(asyncio.wrap_future(future))
+    except asyncio.CancelledError:
+        cancelled.set()
+        if not future.cancel() and not future.done():
+            # Only the call made by this job (on the dispatcher thread) may be cancelled, not that
+            # of another thread which holds the runtime while this job waits for it (and will not start)
+            if DISPATCHER.running_submitted():
+                call = current_call()
+                if call is None or not call.cancel():
+                    warnings.warn(f'MATLAB call {name} is running in the dispatcher thread and cannot be '
+                                  'interrupted, it will run to completion', RuntimeWarning)
+        raise
+
+
+class _AsyncFunction(object):
+    def __init__(self, interface, name):
+        self._interface = interface
+        self._name = name[:-1] if name.endswith('_') else name
+
+    def __getattr__(self, name):
+        return _AsyncFunction(self._interface, f'{self._name}.{name}')
+
+    def __call__(self, *args, nargout=1, **kwargs):
+        loop = asyncio.get_running_loop()
+        cancelled = threading.Event()
+        future = DISPATCHER.submit(_call_unless_cancelled, cancelled, self._interface, self._name,
+                                   args, kwargs, nargout)
+        return loop.create_task(_result(self._name, future, cancelled))
+
+
+class MatlabAsync(object):
+    """
+    Calls MATLAB functions from coroutines: ``w = await m.aio.cut_sqw(...)``
+
+    Each call must be made in a running event loop and returns an `asyncio.Task`.
+    The number of outputs is given by `nargout` (default 1) as it cannot be
+    determined from the assignment as it is for blocking calls.
+    """
+
+    def __init__(self, interface):
+        self._interface = interface
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return _AsyncFunction(self._interface, name)
@@ -0,0 +1,117 @@
+"""
+Batched MATLAB calls: many calls are sent to MATLAB and run there in order with a
+single crossing of the Python / MATLAB interface (see `call_batch` in ``call.m``).
+"""
+import concurrent.futures
+import numpy as np
+from libpymcr.MatlabProxyObject import unwrap
+from ._proxy import wrap
+
+
+class MatlabBatchError(RuntimeError):
+    """The error raised by one call of a batch"""
+
+    def __init__(self, index, name, identifier, message):
+        super().__init__(f'Call {index} ({name}) of batch failed: {message}')
+        self.index = index
+        self.name = name
+        self.identifier = identifier
+        self.message = message
+
+
+class _BatchFunction(object):
+    def __init__(self, batch, name):
+        self._batch = batch
+        self._name = name[:-1] if name.endswith('_') else name
+
+    def __getattr__(self, name):
+        return _BatchFunction(self._batch, f'{self._name}.{name}')
+
+    def __call__(self, *args, nargout=1, **kwargs):
+        return self._batch.add(self._name, *args, nargout=nargout, **kwargs)
+
+
+class MatlabBatch(object):
+    """
+    Queues MATLAB calls which are all run, in order, by `run` with one Python / MATLAB crossing.
+
+    Calls are queued as on `Matlab` (``batch.func(*args, nargout=1)``) or with `add`, and each
+    returns a `concurrent.futures.Future` for its result. A future can be passed as an argument
+    to a later call of the same batch to use (the first output of) that result in MATLAB.
+    All calls are run even if some fail. Used as a context manager, the batch is run on
+    exit, and the error of the first failed call is raised.
+
+    The number of outputs of each call is not determined automatically: it is given by
+    `nargout` (1 by default; functions which return nothing then give None).
+    """
+
+    def __init__(self, interface):
+        self._interface = interface
+        self._calls = []
+        self._futures = []
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return _BatchFunction(self, name)
+
+    def __len__(self):
+        return len(self._calls)
+
+    def add(self, name, *args, nargout=1, **kwargs):
+        """Queues a call of the MATLAB function `name` and returns a future for its result"""
+        args += sum(kwargs.items(), ())
+        future = concurrent.futures.Future()
+        self._calls.append((name, int(nargout), args))
+        self._futures.append(future)
+        return future
+
+    def _resolve(self, arg, refs):
+        # Futures of this batch refer to the result in MATLAB, others are replaced by their value
+        if isinstance(arg, concurrent.futures.Future):
+            if id(arg) in refs:
+                return {'pace_batch_ref': float(refs[id(arg)] + 1)}
+            return arg.result()
+        return arg
+
+    def run(self):
+        """
+        Runs the queued calls and sets the results of their futures.
+
+        :return: The list of results, with a `MatlabBatchError` in place of the result of
+                 each call which failed
+        """
+        calls, futures = self._calls, self._futures
+        self._calls, self._futures = [], []
+        if not calls:
+            return []
+        refs = {id(future): idx for idx, future in enumerate(futures)}
+        names, counts, flat_args = [], [], []
+        for name, nargout, args in calls:
+            names.append(name)
+            counts += [nargout, len(args)]
+            flat_args += [self._resolve(arg, refs) for arg in args]
+        flat_args = unwrap(flat_args, self._interface)
+        outcomes = self._interface.call('_call_batch', '\n'.join(names), np.array(counts, dtype=np.float64),
+                                        *flat_args, nargout=1)
+        results = []
+        for idx, ((name, nargout, _), future, outcome) in enumerate(zip(calls, futures, outcomes)):
+            if bool(outcome[0]):
+                outputs = wrap(list(outcome[1]), self._interface)
+                result = None if nargout == 0 else (outputs[0] if nargout == 1 else tuple(outputs))
+                future.set_result(result)
+            else:
+                result = MatlabBatchError(idx, name, outcome[1], outcome[2])
+                future.set_exception(result)
+            results.append(result)
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            errors = [r for r in self.run() if isinstance(r, MatlabBatchError)]
+            if errors:
+                raise errors[0]
+        return False
@@ -0,0 +1,246 @@
+"""
+Blocking MATLAB calls with timeouts and cancellation: ``m.<func>(..., timeout=10)``.
+
+libpymcr cancels a running MATLAB call when Python receives a signal (Ctrl+C)
+while it waits for the result. A timeout or `MatlabCall.cancel` raises the same
+interrupt in the main thread with `_thread.interrupt_main`, which is then turned
+into a `MatlabTimeout` or `MatlabCancelled` error. The MATLAB session remains usable.
+Only calls made from the main thread can be interrupted this way.
+"""
+import time
+import signal
+import _thread
+import threading
+import numpy as np
+from libpymcr.MatlabProxyObject import MatlabProxyObject, unwrap
+from ._proxy import wrap
+from libpymcr.utils import get_nlhs
+from ._dispatch import DISPATCHER
+
+# The call made by each thread (there is one MATLAB session, which the dispatcher lets one thread use at a time)
+_CALLS = {}
+# Results of at least this many bytes are kept in MATLAB as `MatlabHandle`s (None to convert all results)
+_HANDLE_THRESHOLD = None
+
+
+class MatlabCancelled(Exception):
+    """A MATLAB call was cancelled"""
+
+
+class MatlabTimeout(MatlabCancelled, TimeoutError):
+    """A MATLAB call did not finish within its timeout"""
+
+
+class MatlabHandle(MatlabProxyObject):
+    """
+    A value kept in MATLAB (by a call with `return_handle`) rather than converted to Python.
+
+    The handle is passed to later calls in place of the value, and the value is freed when the
+    last reference to the handle is deleted. `fetch` converts the value to Python.
+    """
+
+    def __init__(self, interface, handle):
+        # Unlike other proxies no MATLAB calls are made when the handle is created
+        self.__dict__['handle'] = handle
+        self.__dict__['interface'] = interface
+
+    def fetch(self):
+        """Converts the value to Python"""
+        return wrap(self.interface.call('deal', self.handle, nargout=1), self.interface)
+
+    def __getattr__(self, name):
+        raise AttributeError(f"'MatlabHandle' object has no attribute '{name}' (use fetch() to get its value)")
+
+    def __dir__(self):
+        return object.__dir__(self)
+
+    def __repr__(self):
+        return '<handle to a value kept in Matlab>'
+
+    __str__ = __repr__
+
+
+def set_handle_threshold(nbytes):
+    """
+    Keeps the results of all later calls which take at least `nbytes` bytes in MATLAB as `MatlabHandle`s
+    (MATLAB objects, which are already kept in MATLAB, are excluded). None converts all results.
+    """
+    global _HANDLE_THRESHOLD
+    _HANDLE_THRESHOLD = nbytes
+
+
+def _wrap_handles(result, nargout, interface):
+    # The outputs of `call_handle` in call.m, which are boxed if they were kept in MATLAB
+    boxed, outputs = result
+    outputs = [MatlabHandle(interface, out) if box else wrap(out, interface)
+               for box, out in zip(np.ravel(boxed), outputs)]
+    if nargout == 0:
+        return None
+    return outputs[0] if nargout == 1 else tuple(outputs)
+
+
+class MatlabCall(object):
+    """A running MATLAB call, which can be cancelled from another thread"""
+
+    def __init__(self, name):
+        self.name = name
+        self.start_time = time.monotonic()
+        self._thread = threading.get_ident()
+        self._lock = threading.Lock()
+        self._running = True
+        self._reason = None
+
+    def cancel(self, reason='cancelled'):
+        """
+        Interrupts the call, which then raises `MatlabCancelled` (or `MatlabTimeout` if `reason`
+        is 'timeout'). Returns False if the call has finished or cannot be interrupted.
+        """
+        with self._lock:
+            if not self._running or self._thread != threading.main_thread().ident \
+                    or threading.get_ident() == self._thread:
+                return False
+            self._running = False
+            self._reason = reason
+            _thread.interrupt_main()
+            return True
+
+    def _finish(self):
+        # Returns why the call was cancelled (or None), after which it cannot be cancelled
+        with self._lock:
+            self._running = False
+            return self._reason
+
+
+class _InterruptWatch(object):
+    """
+    Records whether SIGINT reached Python during a call from the main thread, passing it on to the
+    previous handler, so that an interrupt sent by `MatlabCall.cancel` just as MATLAB returned can
+    be absorbed rather than raised as a KeyboardInterrupt in unrelated code later.
+    """
+
+    def __init__(self):
+        self.active = threading.current_thread() is threading.main_thread()
+        self.delivered = False
+        self._absorbing = False
+        self._previous = None
+
+    def __enter__(self):
+        if self.active:
+            self._previous = signal.signal(signal.SIGINT, self._handler)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.active:
+            signal.signal(signal.SIGINT, self._previous if self._previous is not None else signal.SIG_DFL)
+        return False
+
+    def _handler(self, signum, frame):
+        self.delivered = True
+        if not self._absorbing:
+            (self._previous if callable(self._previous) else signal.default_int_handler)(signum, frame)
+
+    def absorb(self):
+        """Waits for an interrupt which has been sent but not yet raised, without raising it"""
+        self._absorbing = True
+        deadline = time.monotonic() + 1
+        while self.active and not self.delivered and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+
+def current_call():
+    """Returns the `MatlabCall` which is running, or None"""
+    return _CALLS.get(DISPATCHER.running_thread())
+
+
+def call_matlab(interface, name, args, kwargs, nargout, timeout=None, return_handle=None):
+    """
+    Calls a MATLAB function through `call.m`, converting the arguments and results
+
+    :param return_handle: True to keep the results in MATLAB as `MatlabHandle`s, or the size
+        in bytes from which results are kept (default: that set by `set_handle_threshold`)
+    """
+    args += sum(kwargs.items(), ())
+    args = unwrap(args, interface)
+    threshold = _HANDLE_THRESHOLD if return_handle is None else return_handle
+    if threshold is True or threshold is False:
+        threshold = 0 if threshold else None
+    call = MatlabCall(name)
+    timer = None
+    if timeout is not None:
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError('A timeout can only be used for MATLAB calls from the main thread')
+        timer = threading.Timer(timeout, call.cancel, kwargs={'reason': 'timeout'})
+        timer.daemon = True
+        timer.start()
+    thread = threading.get_ident()
+    previous_call = _CALLS.get(thread)
+    _CALLS[thread] = call
+    try:
+        with _InterruptWatch() as watch:
+            try:
+                try:
+                    if threshold is None:
+                        result = interface.call(name, *args, nargout=nargout)
+                    else:
+                        result = interface.call('_call_handle', float(threshold), float(nargout), name, *args, nargout=2)
+                except BaseException:
+                    reason = call._finish()
+                    if reason is None:
+                        raise
+                    watch.absorb()
+                else:
+                    # The call may have been cancelled just as MATLAB returned
+                    reason = call._finish()
+                    if reason is not None:
+                        watch.absorb()
+            except KeyboardInterrupt:
+                # The interrupt from `cancel` was raised after MATLAB returned but before it was absorbed
+                reason = call._finish()
+                if reason is None:
+                    raise
+    finally:
+        if previous_call is None:
+            del _CALLS[thread]
+        else:
+            _CALLS[thread] = previous_call
+        if timer is not None:
+            timer.cancel()
+    # A call which `cancel` reported as cancelled raises even if MATLAB returned a result
+    if reason == 'timeout':
+        raise MatlabTimeout(f'MATLAB call {name} did not finish within {timeout}s')
+    elif reason is not None:
+        raise MatlabCancelled(f'MATLAB call {name} was cancelled')
+    if threshold is not None:
+        return _wrap_handles(result, nargout, interface)
+    return wrap(result, interface)
+
+
+class MatlabFunction(object):
+    """
+    A MATLAB function (or package) of a `Matlab` session, called as ``m.<func>(*args, **kwargs)``.
+
+    The `nargout` keyword sets the number of outputs, which is otherwise deduced from the assignment,
+    `timeout` (in seconds) interrupts the call if it takes longer, raising `MatlabTimeout`,
+    and `return_handle=True` keeps the results in MATLAB as `MatlabHandle`s (see `call_matlab`).
+    """
+
+    def __init__(self, interface, name):
+        self._interface = interface
+        self._name = name[:-1] if name.endswith('_') else name
+
+    def __getattr__(self, name):
+        return MatlabFunction(self._interface, f'{self._name}.{name}')
+
+    def __call__(self, *args, **kwargs):
+        nargout = kwargs.pop('nargout') if 'nargout' in kwargs else None
+        timeout = kwargs.pop('timeout') if 'timeout' in kwargs else None
+        return_handle = kwargs.pop('return_handle') if 'return_handle' in kwargs else None
+        nreturn = get_nlhs(self._name)
+        if nargout is None:
+            mnargout, undetermined = self._interface.call('getArgOut', self._name, nargout=2)
+            nargout = nreturn if undetermined else min(int(mnargout), nreturn)
+        return call_matlab(self._interface, self._name, args, kwargs, nargout, timeout, return_handle)
+
+    def getdoc(self):
+        # To avoid error message printing in Spyder
+        raise NotImplementedError
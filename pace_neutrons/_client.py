@@ -0,0 +1,136 @@
+"""
+A client for a MATLAB session running in a server process (``pace_neutrons_server``)::
+
+    $ pace_neutrons_server &
+
+    from pace_neutrons import MatlabClient
+    m = MatlabClient()
+    w = m.cut_sqw(sqw_file, proj, [-1, 0.05, 1], [-1, 0.05, 1], [-10, 10], [10, 20])
+    signal = w.data.s
+
+The MATLAB runtime is not loaded into this process, so other libraries can be imported in
+any order, a crash in MATLAB does not take this process down, and several clients can share
+one running session. Large numeric arrays are passed through shared memory (see `_transport`)
+and MATLAB objects stay in the server, returned as `RemoteMatlabObject`s.
+"""
+import os
+import weakref
+import threading
+from multiprocessing.connection import Client
+from ._transport import RemoteRef, RemoteMethod, default_address, key_file, read_key, encode, decode, release
+
+
+class _RemoteFunction(object):
+    def __init__(self, client, name):
+        self._client = client
+        self._name = name[:-1] if name.endswith('_') else name
+
+    def __getattr__(self, name):
+        return _RemoteFunction(self._client, f'{self._name}.{name}')
+
+    def __call__(self, *args, nargout=1, **kwargs):
+        return self._client._request('call', self._name, args, kwargs, nargout)
+
+
+class _RemoteMethod(object):
+    def __init__(self, obj, name):
+        self._obj = obj
+        self._name = name
+
+    def __call__(self, *args, nargout=1, **kwargs):
+        return self._obj._client._request('method', self._obj, self._name, args, kwargs, nargout)
+
+
+class RemoteMatlabObject(object):
+    """
+    A MATLAB object kept by the server, whose properties and methods are used as on a local
+    proxy. The server frees the object once this is deleted.
+    """
+
+    def __init__(self, client, ref):
+        self.__dict__['_client'] = client
+        self.__dict__['_ref'] = ref
+        weakref.finalize(self, client._released.append, ref)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        value = self._client._request('getattr', self, name)
+        return _RemoteMethod(self, name) if isinstance(value, RemoteMethod) else value
+
+    def __setattr__(self, name, value):
+        self._client._request('setattr', self, name, value)
+
+    def __getitem__(self, key):
+        return self._client._request('getitem', self, key)
+
+    def __len__(self):
+        return self._client._request('len', self)
+
+    def __dir__(self):
+        return self._client._request('dir', self)
+
+    def __repr__(self):
+        return self._client._request('repr', self)
+
+
+class MatlabClient(object):
+    """
+    Calls MATLAB functions in a server process as ``m.<func>(*args, nargout=1, **kwargs)``.
+
+    The number of outputs is given by `nargout` (default 1), as it is not deduced from the assignment.
+
+    :param address: The address of the server (default: see `_transport.default_address`)
+    :param authkey: The authentication key of the server (default: that written by the server)
+    """
+
+    def __init__(self, address=None, authkey=None):
+        address, authkey = default_address(address, authkey)
+        if authkey is None and os.path.exists(key_file(address)):
+            authkey = read_key(key_file(address))
+        if authkey is None:
+            # Without a key the server is not authenticated, and its replies cannot be trusted
+            raise ValueError(f'No authentication key for the server at {address}')
+        self._conn = Client(address, authkey=authkey)
+        self._lock = threading.Lock()
+        # Objects deleted since the last request, which the server can free
+        self._released = []
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return _RemoteFunction(self, name)
+
+    def _encode_object(self, value):
+        return RemoteRef(value._ref) if isinstance(value, RemoteMatlabObject) else value
+
+    def _decode_object(self, value):
+        return RemoteMatlabObject(self, value.ref)
+
+    def _request(self, kind, *payload):
+        blocks = []
+        with self._lock:
+            released = self._released[:]
+            del self._released[:len(released)]
+            try:
+                self._conn.send((kind, released, encode(payload, blocks, self._encode_object)))
+                status, value = self._conn.recv()
+                # The server frees the shared memory of its reply when the next request arrives
+                value = decode(value, self._decode_object)
+            finally:
+                release(blocks)
+        if status == 'error':
+            raise value
+        return value
+
+    def close(self):
+        """Disconnects from the server, which frees the objects of this client"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
@@ -0,0 +1,159 @@
+"""
+Creates the ``pace_<version>.ctf`` files from the ``nomex_<version>.xz`` stubs and ``mexes.xz``.
+
+Each CTF is written to a temporary file and renamed into place, and a lock file
+stops several processes (e.g. jobs on a cluster all starting at once) from
+creating the same CTF: the others wait for it and reuse the finished file.
+The lock holds the host and PID of its owner, which refreshes its mtime while
+it works, and is only removed by its owner or once it has not been refreshed
+for `_STALE_LOCK_SECONDS`.
+
+Running this module as a script creates the CTFs for several versions in parallel::
+
+    python -m pace_neutrons._ctf <ctf_folder> <version> [<version> ...]
+"""
+import os
+import sys
+import time
+import socket
+import threading
+import subprocess
+from pathlib import Path
+
+# A lock not refreshed for longer than this is assumed to be left over from a process which died.
+# The process holding a lock touches it every _REFRESH_SECONDS while it creates the CTF.
+_STALE_LOCK_SECONDS = 900
+_REFRESH_SECONDS = 60
+_POLL_SECONDS = 0.5
+
+
+def _is_stale(lockfile):
+    try:
+        return (time.time() - os.stat(lockfile).st_mtime) > _STALE_LOCK_SECONDS
+    except OSError:
+        return False
+
+
+def _remove(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+
+
+def _read(filename):
+    try:
+        with open(filename) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _remove_stale(lockfile):
+    # The lock is moved aside before it is removed, so that if another process replaced the
+    # stale lock by its own in the meantime, that lock is put back rather than deleted
+    aside = f'{lockfile}.{os.getpid()}.stale'
+    try:
+        os.replace(lockfile, aside)
+    except OSError:
+        return
+    if not _is_stale(aside):
+        try:
+            os.link(aside, lockfile)
+        except OSError:
+            pass
+    _remove(aside)
+
+
+def _release(lockfile, owner):
+    # Only removes the lock if it is still ours (it was not taken over as stale)
+    if _read(lockfile) == owner:
+        _remove(lockfile)
+
+
+def _refresh(lockfile, owner, done):
+    while not done.wait(_REFRESH_SECONDS):
+        if _read(lockfile) != owner:
+            break
+        try:
+            os.utime(lockfile)
+        except OSError:
+            break
+
+
+def build_ctf(version, ctfdir, verbose=True):
+    """
+    Creates the CTF for a MATLAB release (e.g. '2021b') in `ctfdir` if it does not exist
+
+    :return: The path to the CTF file
+    """
+    from libpymcr.utils import recombinemex
+    ctfdir = Path(ctfdir)
+    ctffile = ctfdir / f'pace_{version}.ctf'
+    lockfile = ctfdir / f'pace_{version}.ctf.lock'
+    # The owner of the lock is identified by host, PID and thread
+    owner = f'{socket.gethostname()} {os.getpid()} {threading.get_ident()}'
+    waiting = False
+    while not ctffile.exists():
+        try:
+            fd = os.open(lockfile, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if _is_stale(lockfile):
+                _remove_stale(lockfile)
+            else:
+                if verbose and not waiting:
+                    print(f'Waiting for another process to create pace CTF for Matlab R{version}')
+                    waiting = True
+                time.sleep(_POLL_SECONDS)
+            continue
+        tmpfile = ctfdir / f'.pace_{version}.ctf.{os.getpid()}.tmp'
+        done = threading.Event()
+        refresher = threading.Thread(target=_refresh, args=(lockfile, owner, done), daemon=True)
+        try:
+            try:
+                os.write(fd, owner.encode())
+            finally:
+                os.close(fd)
+            refresher.start()
+            if not ctffile.exists():
+                if verbose:
+                    print(f'Please wait... creating pace CTF for Matlab R{version}')
+                recombinemex(f'R{version}', str(ctfdir), outfilename=str(tmpfile))
+                os.replace(tmpfile, ctffile)
+        finally:
+            done.set()
+            if refresher.is_alive():
+                refresher.join()
+            _remove(tmpfile)
+            _release(lockfile, owner)
+    return ctffile.resolve()
+
+
+def build_ctfs_in_background(versions, ctfdir):
+    """
+    Creates the CTFs for the given versions in a detached process so as not to delay startup.
+
+    A separate interpreter is used rather than a multiprocessing pool in this process because
+    the `spawn` start method would re-run the user's script in the children.
+    """
+    if not versions:
+        return None
+    kwargs = {'start_new_session': True} if os.name == 'posix' else {}
+    return subprocess.Popen([sys.executable, '-m', 'pace_neutrons._ctf', str(ctfdir)] + list(versions),
+                            cwd=str(Path(__file__).parent.parent), stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **kwargs)
+
+
+def _build_quietly(version, ctfdir):
+    return str(build_ctf(version, ctfdir, verbose=False))
+
+
+if __name__ == '__main__':
+    import concurrent.futures
+    ctfdir, versions = sys.argv[1], sys.argv[2:]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(len(versions), 1)) as pool:
+        for future in [pool.submit(_build_quietly, ver, ctfdir) for ver in versions]:
+            try:
+                future.result()
+            except Exception as err:
+                print(err, file=sys.stderr)
@@ -0,0 +1,144 @@
+"""
+Cached discovery of the compiled CTF files and of the MATLAB / MCR installations.
+
+Listing the ``ctfs`` folder and probing every supported MATLAB release with
+``libpymcr.utils.checkPath`` is slow on network file systems, so the results are
+kept in a small JSON index next to the ``pace.ini`` configuration file.
+Entries are validated with a single ``stat`` call each (the modification time of the
+``ctfs`` folder or of the ``VersionInfo.xml`` file of a MATLAB root) and only
+recomputed when that stamp changes. MATLAB locations are also recomputed when the
+environment variables which `checkPath` searches change.
+
+Set the ``PACE_NO_DISCOVERY_CACHE`` environment variable to bypass the index.
+"""
+import os
+import json
+import hashlib
+from pathlib import Path
+from ._profiling import TIMER
+
+_INDEX_FORMAT = 2
+# Environment variables which can change where `checkPath` finds MATLAB
+_SEARCH_ENV = ['PATH', 'LD_LIBRARY_PATH', 'DYLD_LIBRARY_PATH', 'PACE_MCR_DIR', 'MATLAB_DIR', 'MATLABEXECUTABLE']
+
+
+def _stamp(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _env_fingerprint():
+    env = '\n'.join(f'{var}={os.environ.get(var, "")}' for var in _SEARCH_ENV)
+    return hashlib.sha1(env.encode()).hexdigest()
+
+
+def _default_index_file():
+    import appdirs
+    return Path(appdirs.user_config_dir('pace_neutrons')) / 'discovery.json'
+
+
+class DiscoveryIndex(object):
+    def __init__(self, index_file=None):
+        self.enabled = 'PACE_NO_DISCOVERY_CACHE' not in os.environ
+        self.index_file = Path(index_file) if index_file else None
+        self.changed = False
+        # The roots found or probed in this process
+        self._resolved = {}
+        self.data = self._load()
+
+    def _load(self):
+        empty = {'format': _INDEX_FORMAT, 'ctfs': {}, 'matlab': {}}
+        if not self.enabled:
+            return empty
+        try:
+            if self.index_file is None:
+                self.index_file = _default_index_file()
+            with open(self.index_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError, ImportError):
+            return empty
+        if not isinstance(data, dict) or data.get('format') != _INDEX_FORMAT:
+            return empty
+        data.setdefault('ctfs', {})
+        data.setdefault('matlab', {})
+        return data
+
+    def save(self):
+        # The index is only an optimisation so failing to write it (e.g. read-only home) is not an error
+        if not (self.enabled and self.changed and self.index_file is not None):
+            return
+        tmpfile = self.index_file.with_name(f'{self.index_file.name}.{os.getpid()}.tmp')
+        try:
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmpfile, 'w') as f:
+                json.dump(self.data, f, indent=1)
+            os.replace(tmpfile, self.index_file)
+        except OSError:
+            try:
+                os.remove(tmpfile)
+            except OSError:
+                pass
+        else:
+            self.changed = False
+
+    def ctf_files(self, folder):
+        """Returns the files in the CTF folder, relisting it only if its mtime changed"""
+        folder = Path(folder).resolve()
+        key, stamp = str(folder), _stamp(folder)
+        entry = self.data['ctfs'].get(key)
+        if entry is None or entry['stamp'] != stamp:
+            # A missing folder (e.g. in a source checkout which has not been built) has no files
+            names = sorted(f.name for f in folder.iterdir() if f.is_file()) if stamp is not None else []
+            entry = {'stamp': stamp, 'files': names}
+            self.data['ctfs'][key] = entry
+            self.changed = True
+        return [folder / name for name in entry['files']]
+
+    def matlab_root(self, version, use_negative=True):
+        """
+        Returns the root folder of the MATLAB / MCR installation for a release (e.g. '2021b') or None.
+
+        Cached entries are only reused while the search environment is unchanged, as that
+        decides which installation `checkPath` finds. A cached root must also still have the
+        same `VersionInfo.xml`, and the library path `checkPath` set when it found the root
+        is set again. A cached "not found" is not reused if `use_negative` is False.
+        """
+        if version in self._resolved:
+            return self._resolved[version]
+        entry = self.data['matlab'].get(version)
+        if entry is not None and entry.get('env') == _env_fingerprint():
+            if entry['root'] is not None:
+                stamp = _stamp(os.path.join(entry['root'], 'VersionInfo.xml'))
+                if stamp is not None and stamp == entry['stamp']:
+                    os.environ.update(entry.get('set_env', {}))
+                    self._resolved[version] = entry['root']
+                    return entry['root']
+            elif use_negative:
+                return None
+        return self._probe(version)
+
+    def _probe(self, version):
+        from libpymcr.utils import checkPath
+        # checkPath sets the library path if it finds MATLAB in a standard location
+        env, before = _env_fingerprint(), {var: os.environ.get(var) for var in _SEARCH_ENV}
+        with TIMER.phase(f'checkPath R{version}'):
+            root = checkPath(f'R{version}', error_if_not_found=False, suppress_output=True)
+        if root is not None:
+            root = str(root)
+            set_env = {var: os.environ[var] for var in _SEARCH_ENV
+                       if var in os.environ and os.environ[var] != before[var]}
+            entry = {'root': root, 'stamp': _stamp(os.path.join(root, 'VersionInfo.xml')),
+                     'env': env, 'set_env': set_env}
+        else:
+            entry = {'root': None, 'env': env}
+        self.data['matlab'][version] = entry
+        self._resolved[version] = root
+        self.changed = True
+        return root
+
+    def clear(self):
+        self.data = {'format': _INDEX_FORMAT, 'ctfs': {}, 'matlab': {}}
+        self._resolved = {}
+        self.changed = True
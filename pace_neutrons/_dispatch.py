@@ -0,0 +1,213 @@
+"""
+Coordinates the use of the (single) MATLAB runtime by several Python threads.
+
+Every call to MATLAB made through a `Matlab` session, including those made by the objects
+it returns, waits for its turn at the `MatlabDispatcher`, which lets one call run at a time
+in priority order: 'interactive' calls go before 'batch' calls, and calls of the same priority
+run in the order they arrived. Blocking calls run on the thread which made them (so that Ctrl+C
+and timeouts still interrupt calls from the main thread), while calls passed to `submit` are run
+by a dispatcher thread and return futures. The time each call waited and ran for is recorded.
+"""
+import time
+import types
+import heapq
+import functools
+import itertools
+import threading
+import contextlib
+import concurrent.futures
+from collections import namedtuple
+
+PRIORITIES = {'interactive': 0, 'batch': 1}
+_FUNCTION_TYPES = (types.FunctionType, types.MethodType, types.BuiltinFunctionType, functools.partial)
+
+CallTiming = namedtuple('CallTiming', ['priority', 'queue_wait', 'run_time'])
+
+
+class MatlabCallFuture(concurrent.futures.Future):
+    """The future result of a call submitted to the dispatcher, with its `timing` once it has run"""
+
+    def __init__(self):
+        super().__init__()
+        self.timing = None
+
+
+class MatlabDispatcher(object):
+    """Admits calls to the MATLAB runtime one at a time, in priority order (see the module docstring)"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._count = itertools.count()
+        self._owner = None
+        self._local = threading.local()
+        self._queue = []
+        self._thread = None
+        self._stats = {name: {'calls': 0, 'queue_wait': 0., 'run_time': 0., 'max_queue_wait': 0.}
+                       for name in PRIORITIES}
+
+    def _priority(self, priority=None):
+        if priority is None:
+            return getattr(self._local, 'priority', 'interactive')
+        if priority not in PRIORITIES:
+            raise ValueError(f'Unknown priority {priority!r}, must be one of {list(PRIORITIES)}')
+        return priority
+
+    @contextlib.contextmanager
+    def priority(self, priority):
+        """Sets the priority of the MATLAB calls made by this thread within a ``with`` block"""
+        previous = self._priority()
+        self._local.priority = self._priority(priority)
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def _acquire(self, priority):
+        ticket = (PRIORITIES[priority], next(self._count))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while self._owner is not None or self._waiting[0] != ticket:
+                    # Waits with a timeout so that a Ctrl+C (or timeout) in the main thread is not held up
+                    self._cond.wait(0.1)
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._owner = threading.get_ident()
+
+    def _release(self, timing):
+        with self._cond:
+            self._owner = None
+            stats = self._stats[timing.priority]
+            stats['calls'] += 1
+            stats['queue_wait'] += timing.queue_wait
+            stats['run_time'] += timing.run_time
+            stats['max_queue_wait'] = max(stats['max_queue_wait'], timing.queue_wait)
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def _inside(self):
+        # Marks this thread as running within the call which holds the runtime
+        previous = getattr(self._local, 'inside', False)
+        self._local.inside = True
+        try:
+            yield
+        finally:
+            self._local.inside = previous
+
+    def _run(self, priority, queued, fn, args, kwargs):
+        self._acquire(priority)
+        started = time.perf_counter()
+        try:
+            with self._inside():
+                return fn(*args, **kwargs)
+        finally:
+            self._local.timing = CallTiming(priority, started - queued, time.perf_counter() - started)
+            self._release(self._local.timing)
+
+    def run(self, fn, *args, priority=None, **kwargs):
+        """Runs ``fn(*args, **kwargs)`` on this thread once it is the turn of a call of this `priority`"""
+        if getattr(self._local, 'inside', False):
+            # A call made within the running call (e.g. to load the objects it returned), or from
+            # a Python function called back by MATLAB (see `callback`), which libpymcr handles
+            return fn(*args, **kwargs)
+        return self._run(self._priority(priority), time.perf_counter(), fn, args, kwargs)
+
+    def callback(self, fn):
+        """
+        Wraps a Python function passed to MATLAB, which may call it back on one of its own threads
+        while the call runs, so that the MATLAB calls it makes pass through rather than wait for it
+        """
+        def run_callback(*args, **kwargs):
+            if self._owner is None:
+                return fn(*args, **kwargs)
+            with self._inside():
+                return fn(*args, **kwargs)
+        return run_callback
+
+    def submit(self, fn, *args, priority=None, **kwargs):
+        """
+        Queues ``fn(*args, **kwargs)`` to be run by the dispatcher thread
+
+        :return: A `MatlabCallFuture` for the result
+        """
+        future = MatlabCallFuture()
+        priority = self._priority(priority)
+        with self._cond:
+            heapq.heappush(self._queue, (PRIORITIES[priority], next(self._count), priority, time.perf_counter(),
+                                         future, fn, args, kwargs))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch, name='pace_neutrons_dispatcher', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return future
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, _, priority, queued, future, fn, args, kwargs = heapq.heappop(self._queue)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = self._run(priority, queued, fn, args, kwargs)
+            except BaseException as err:
+                future.timing = self._local.timing
+                future.set_exception(err)
+            else:
+                future.timing = self._local.timing
+                future.set_result(result)
+
+    def running_thread(self):
+        """The identifier of the thread whose call is running (or None)"""
+        return self._owner
+
+    def running_submitted(self):
+        """True if the call which is running was passed to `submit` (and is run by the dispatcher thread)"""
+        thread = self._thread
+        return thread is not None and self._owner == thread.ident
+
+    def last_timing(self):
+        """The `CallTiming` of the last call run by this thread (or None)"""
+        return getattr(self._local, 'timing', None)
+
+    def stats(self):
+        """The number of calls of each priority and their total queue wait and run times (in seconds)"""
+        with self._cond:
+            return {name: dict(stats, queued=sum(1 for item in self._queue if item[2] == name))
+                    for name, stats in self._stats.items()}
+
+
+class DispatchedInterface(object):
+    """Wraps the libpymcr interface so that every call to MATLAB goes through the dispatcher"""
+
+    def __init__(self, interface, dispatcher):
+        self._interface = interface
+        self._dispatcher = dispatcher
+
+    def call(self, *args, **kwargs):
+        return self._dispatcher.run(self._interface.call, *self._callbacks(args), **kwargs)
+
+    def _callbacks(self, inputs):
+        # Python functions passed to MATLAB may be called back from within the call (see `callback`)
+        if isinstance(inputs, _FUNCTION_TYPES):
+            return self._dispatcher.callback(inputs)
+        elif isinstance(inputs, tuple):
+            return tuple(self._callbacks(v) for v in inputs)
+        elif isinstance(inputs, list):
+            return [self._callbacks(v) for v in inputs]
+        elif isinstance(inputs, dict):
+            return {k: self._callbacks(v) for k, v in inputs.items()}
+        return inputs
+
+    def __getattr__(self, name):
+        return getattr(self._interface, name)
+
+
+# There is one MATLAB runtime per process
+DISPATCHER = MatlabDispatcher()
@@ -0,0 +1,330 @@
+"""
+The `Matlab` class which starts the MATLAB runtime with the pace CTF.
+
+This module is imported on first access to `pace_neutrons.Matlab` so that
+``import pace_neutrons`` does not load libpymcr, numpy or brille.
+"""
+import os
+import sys
+import hashlib
+import warnings
+import threading
+import concurrent.futures
+from pathlib import Path
+from typing import Optional
+
+from ._profiling import TIMER as _TIMER
+with _TIMER.phase('import libpymcr'):
+    import libpymcr
+
+with _TIMER.phase('import FunctionWrapper'):
+    from . import FunctionWrapper
+
+from . import _discovery
+from . import nostdout
+from ._batch import MatlabBatch
+from ._aio import MatlabAsync
+from ._calls import MatlabFunction, current_call, call_matlab
+from ._calls import set_handle_threshold
+from ._dispatch import DISPATCHER, DispatchedInterface
+
+VERSION = ''
+INITIALIZED = False
+# The `Matlab` instance returned by every `Matlab()` call once the runtime is initialised
+_INSTANCE = None
+# Serialises MATLAB startup between the main thread and `Matlab.start_async`
+_INIT_LOCK = threading.RLock()
+
+
+def _initialize_compiled_worker(interface):
+    import platform, shutil
+    worker_path = os.path.join(os.path.dirname(sys.argv[0]), 'worker_v4')
+    if platform.system() == 'Windows':
+        worker_path += '.exe'
+    if not os.path.exists(worker_path):
+        worker_path = shutil.which('worker_v4')
+    if worker_path:
+        with nostdout(), _TIMER.phase('worker configuration'):
+            pc = interface.call('parallel_config', nargout=1)
+            access = interface.call('substruct', '.', 'worker')
+            interface.call('subsasgn', pc, access, worker_path)
+
+
+def _horace_init_key(ctffile):
+    # Identifies the CTF and the Matlab runtime by their paths and timestamps (hashing the
+    # contents of the CTF would take longer than the initialisation we are trying to avoid)
+    stat = os.stat(ctffile)
+    stamps = [str(Path(ctffile).resolve()), str(stat.st_size), str(stat.st_mtime_ns)]
+    mlroot = os.environ.get('LIBPYMCR_MATLAB_ROOT', '')
+    stamps += [mlroot, str(_discovery._stamp(os.path.join(mlroot, 'VersionInfo.xml')))]
+    return hashlib.sha1('|'.join(stamps).encode()).hexdigest()
+
+
+def _initialize_horace(interface, ctffile):
+    # Runs `pyhorace_init`, skipping the configuration and mex checks if they have
+    # already been done for this CTF and Matlab runtime. Workers don't print banners.
+    quiet = 'worker' in sys.argv[0]
+    try:
+        from pace_neutrons_cli.utils import PaceConfiguration
+        config = PaceConfiguration()
+        key = _horace_init_key(ctffile)
+    except (OSError, ImportError):
+        config, key = None, None
+    cached = config.HoraceInitState if config is not None else None
+    if cached is None or cached.pop('key', None) != key:
+        cached = []
+    with _TIMER.phase('pyhorace_init (cached)' if cached else 'pyhorace_init'):
+        state = interface.call('pyhorace_init', cached, quiet, nargout=1)
+    state = {'key': key, 'use_mex': bool(state['use_mex']), 'init_tests': bool(state['init_tests'])}
+    if config is not None and state != config.HoraceInitState:
+        config.HoraceInitState = state
+        try:
+            config.save()
+        except OSError:
+            pass
+
+
+def _initialize_python_calls(interface):
+    # Matlab code such as pyclasswrapper calls Python functions by name, for which call.m needs
+    # the pointers to the libpymcr functions which libpymcr passes with any Python function
+    interface.call('_set_python_ptrs', FunctionWrapper.remove_object, nargout=0)
+
+
+def _package_version():
+    import pace_neutrons
+    return pace_neutrons.__version__
+
+
+def _check_version(matlab_version):
+    if matlab_version is not None and matlab_version.lower() != VERSION.lower():
+        warnings.warn(f"MATLAB R{VERSION} is already running in this process, "
+                      f"so matlab_version={matlab_version} is ignored")
+
+
+class MatlabFuture(concurrent.futures.Future):
+    """
+    A future resolving to a started `Matlab` instance.
+
+    Attribute access is forwarded to the instance, so it can be used in place of it;
+    calls made before MATLAB has started wait for the startup to finish.
+    It can also be awaited in a coroutine.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.result(), name)
+
+    def __await__(self):
+        import asyncio
+        return asyncio.wrap_future(self).__await__()
+
+
+class Matlab(libpymcr.Matlab):
+
+    def __new__(cls, *args, **kwargs):
+        # Once started, the same instance is returned without taking the lock or calling MATLAB
+        instance = _INSTANCE
+        if instance is not None and isinstance(instance, cls):
+            return instance
+        return super().__new__(cls)
+
+    def __init__(self, matlab_path: Optional[str] = None, matlab_version: Optional[str] = None):
+        """
+        Create a MATLAB instance with the correct compiled library for the MATLAB version specified.
+        If no version is specified, the first version found will be used. If no MATLAB versions are 
+        found, a RuntimeError will be raised. If a version is specified, but not found, a RuntimeError
+        will be raised.
+
+        :param matlab_path: Path to the root directory of the MATLAB installation or MCR installation.
+        :param matlab_version: Used to specify the version of MATLAB if the matlab_path is given or if
+        there is more than 1 MATLAB installation.
+
+        Only one MATLAB runtime can be started per process: once it is initialised, `Matlab()`
+        returns the existing instance (see `Matlab.reset`).
+        """
+        from ._ctf import build_ctf, build_ctfs_in_background
+        from . import _VERSIONS, _NOMEXS, _VERSION_DIR, _MATLABNOTFOUND_STR, _checkML
+        global INITIALIZED
+        global VERSION
+        global _INSTANCE
+
+        if self is _INSTANCE:
+            _check_version(matlab_version)
+            return
+        with _INIT_LOCK:
+            if _INSTANCE is not None:
+                # Another thread started MATLAB after this object was created in `__new__`
+                _check_version(matlab_version)
+                self._interface = _INSTANCE._interface
+                return
+            if matlab_version is None:
+                with _TIMER.phase('find Matlab'):
+                    avail_ML = _checkML(_VERSIONS)
+                if avail_ML:
+                    ctffile, mlpath = avail_ML[0]['file'], matlab_path or avail_ML[0]['root']
+                else:
+                    with _TIMER.phase('find Matlab'):
+                        avail_ML = _checkML(_NOMEXS)
+                    if not avail_ML:
+                        raise RuntimeError(_MATLABNOTFOUND_STR)
+                    # Only the CTF which is used is created now, the others in a separate process
+                    with _TIMER.phase('recombinemex'):
+                        ctffile = build_ctf(avail_ML[0]['version'], _VERSION_DIR)
+                    build_ctfs_in_background([v['version'] for v in avail_ML[1:]], _VERSION_DIR)
+                    mlpath = matlab_path or avail_ML[0]['root']
+            else:
+                ctf = [v['file'] for v in _VERSIONS if v['version'].lower() == matlab_version.lower()]
+                nmx = [v for v in _NOMEXS if v['version'].lower() == matlab_version.lower()]
+                if not ctf and nmx:
+                    with _TIMER.phase('recombinemex'):
+                        ctf = [build_ctf(nmx[0]['version'], _VERSION_DIR)]
+                if len(ctf) == 0:
+                    raise RuntimeError(
+                        f"Compiled library for MATLAB version {matlab_version} not found. "
+                        f"Please use: [{', '.join([version['version'] for version in _NOMEXS])}]\n ")
+                else:
+                    ctffile, mlpath = ctf[0], matlab_path
+            # libpymcr creates the MCR session and extracts the CTF in one call
+            with _TIMER.phase('MCR session and CTF extraction'):
+                super().__init__(ctffile, mlPath=mlpath)
+            # All calls, from any thread, wait for their turn at the dispatcher
+            self._interface = DispatchedInterface(self._interface, DISPATCHER)
+            INITIALIZED = True
+            VERSION = Path(ctffile).stem.split('_')[1]
+            _initialize_horace(self._interface, ctffile)
+            _initialize_python_calls(self._interface)
+            if 'worker' not in sys.argv[0]:
+                _initialize_compiled_worker(self._interface)
+            _TIMER.info.update(ctf=str(ctffile), matlab_root=os.environ.get('LIBPYMCR_MATLAB_ROOT'),
+                               pace_neutrons=_package_version())
+            _TIMER.dump()
+            _INSTANCE = self
+
+    @classmethod
+    def reset(cls):
+        """
+        Forgets the running instance so that the next `Matlab()` call runs the pace
+        initialisation (`pyhorace_init` and the worker configuration) again.
+
+        The MATLAB runtime itself cannot be restarted within a process, so the existing
+        session is reused and a different `matlab_version` cannot be selected.
+        Instances created before the reset remain usable.
+        """
+        global INITIALIZED
+        global _INSTANCE
+        with _INIT_LOCK:
+            _INSTANCE = None
+            INITIALIZED = False
+
+    def __getattr__(self, name):
+        """
+        Returns a `MatlabFunction` which calls the MATLAB function `name`, e.g. ``m.cut_sqw(...)``.
+        Calls from several threads are run one at a time (see `Matlab.submit` and `Matlab.priority`).
+        Calls accept a `timeout` keyword (in seconds), after which the call is interrupted and
+        `MatlabTimeout` is raised.
+        """
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return MatlabFunction(self._interface, name)
+
+    @property
+    def current_call(self):
+        """
+        The `MatlabCall` running in MATLAB (or None), which can be cancelled from another thread with
+        ``m.current_call.cancel()``, raising `MatlabCancelled` in the thread which made the call
+        """
+        return current_call()
+
+    def keep_results(self, nbytes):
+        """
+        Keeps the results of later calls which take at least `nbytes` bytes (e.g. the pixels of an sqw
+        read with ``read_sqw``) in MATLAB as `MatlabHandle`s rather than converting them to Python.
+        They are passed to further calls as they are, and their `fetch` method converts them.
+        `nbytes=None` converts all results again. A single call can override this with the
+        `return_handle` keyword.
+        """
+        set_handle_threshold(nbytes)
+
+    def submit(self, name, *args, nargout=1, priority=None, **kwargs):
+        """
+        Queues a call of the MATLAB function `name`, which is run by the dispatcher thread when
+        MATLAB is free, and returns a `MatlabCallFuture` for its result (with the time it waited and
+        ran for in its `timing`). The number of outputs is given by `nargout` (default 1).
+
+        :param priority: 'interactive' calls run before 'batch' calls (default: the priority of this
+            thread, see `Matlab.priority`)
+        """
+        return DISPATCHER.submit(call_matlab, self._interface, name, args, kwargs, nargout, priority=priority)
+
+    def priority(self, priority):
+        """
+        Sets the priority ('interactive', the default, or 'batch') of the MATLAB calls made by
+        this thread within a ``with`` block, e.g. in a background job::
+
+            with m.priority('batch'):
+                w = m.cut_sqw(...)
+        """
+        return DISPATCHER.priority(priority)
+
+    @property
+    def dispatcher(self):
+        """The `MatlabDispatcher`, with the timings of calls (`last_timing` and `stats`)"""
+        return DISPATCHER
+
+    @property
+    def aio(self):
+        """
+        An asyncio interface to MATLAB: ``w = await m.aio.cut_sqw(...)`` (see `MatlabAsync`)
+        """
+        return MatlabAsync(self._interface)
+
+    def batch(self, calls=None):
+        """
+        Runs many MATLAB calls with a single Python / MATLAB crossing.
+
+        Without arguments returns a `MatlabBatch` on which calls are queued, e.g.::
+
+            with m.batch() as b:
+                b.acolor('black')
+                proj = b.projaxes([1, 0, 0], [0, 1, 0], 'type', 'rrr')
+                cut = b.cut_sqw(sqw_file, proj, [-1, 0.05, 1], [-1, 0.05, 1], [-10, 10], [10, 20])
+            w1 = cut.result()
+
+        :param calls: Optionally, a list of `(name, args)` or `(name, args, kwargs)` tuples which are run at
+            once (`kwargs` may include `nargout`, which defaults to 1).
+        :return: A `MatlabBatch`, or if `calls` is given the list of their results, with a `MatlabBatchError`
+            in place of the result of each call which failed
+        """
+        batch = MatlabBatch(self._interface)
+        if calls is None:
+            return batch
+        for call in calls:
+            args = call[1] if len(call) > 1 else ()
+            kwargs = call[2] if len(call) > 2 else {}
+            batch.add(call[0], *args, **kwargs)
+        return batch.run()
+
+    @classmethod
+    def start_async(cls, matlab_path: Optional[str] = None, matlab_version: Optional[str] = None):
+        """
+        Starts MATLAB on a background thread and returns a `MatlabFuture` immediately,
+        so that other work can be done while the runtime initialises.
+
+        :param matlab_path: Path to the root directory of the MATLAB installation or MCR installation.
+        :param matlab_version: Used to specify the version of MATLAB if the matlab_path is given or if
+        there is more than 1 MATLAB installation.
+        :return: A `MatlabFuture` which resolves to the `Matlab` instance (or raises the startup error)
+        """
+        future = MatlabFuture()
+        def _start():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                instance = cls(matlab_path, matlab_version)
+            except BaseException as err:
+                future.set_exception(err)
+            else:
+                future.set_result(instance)
+        threading.Thread(target=_start, name='pace_neutrons_startup', daemon=True).start()
+        return future
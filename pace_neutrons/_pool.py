@@ -0,0 +1,165 @@
+"""
+A pool of worker processes each running its own MATLAB session.
+
+Only one MATLAB runtime can be started per process, so independent calls (e.g.
+many ``cut_sqw`` calls over different energy windows) are run in parallel by
+sending the function name and arguments to worker processes::
+
+    from pace_neutrons import MatlabPool
+    with MatlabPool(4) as pool:
+        futures = [pool.submit('cut_sqw', sqw_file, proj, [-3,0.05,3], [-1.05,-0.95], [-0.05,0.05], [en-10, en+10])
+                   for en in range(80, 160, 20)]
+        cuts = [future.result() for future in futures]
+        sims = list(pool.map('sqw_eval', cuts, [model]*len(cuts), [pars]*len(cuts)))
+
+Arguments and results are pickled, so they must be arrays, strings, numbers or
+(nested) lists, tuples and dicts of these. MATLAB objects (e.g. ``sqw``) and
+`MatlabHandle`s are returned as `MatlabBlob`s, which can be passed to further pool
+calls, or loaded into the MATLAB session of this process with `MatlabBlob.load`.
+"""
+import os
+import sys
+import functools
+import multiprocessing
+import concurrent.futures
+
+# The MATLAB session (or other backend) of a worker process, created by `_initialize_worker`
+_WORKER_BACKEND = None
+
+
+def start_matlab(matlab_path=None, matlab_version=None):
+    """The default backend: a `pace_neutrons.Matlab` session"""
+    from pace_neutrons import Matlab
+    return Matlab(matlab_path, matlab_version)
+
+
+class MatlabBlob(object):
+    """
+    A MATLAB object serialised (with getByteStreamFromArray) in a worker process.
+    `handle` is True if it was a `MatlabHandle`, which is loaded as a handle again.
+    """
+
+    def __init__(self, data, classname='', handle=False):
+        self.data = data
+        self.classname = classname
+        self.handle = handle
+
+    def load(self, m):
+        """Deserialises the object in the MATLAB session `m`"""
+        import numpy as np
+        stream = np.frombuffer(self.data, dtype=np.uint8).reshape(1, -1)
+        if self.handle:
+            return m.getArrayFromByteStream(stream, nargout=1, return_handle=True)
+        return m.getArrayFromByteStream(stream, nargout=1)
+
+    def __repr__(self):
+        return f'<MatlabBlob of {self.classname} ({len(self.data)} bytes)>'
+
+
+def _initialize_worker(backend, matlab_path, matlab_version):
+    global _WORKER_BACKEND
+    _WORKER_BACKEND = backend(matlab_path, matlab_version)
+
+
+def _is_matlab_object(value):
+    # Any proxy (including `MatlabHandle`s and lazy proxies) derives from MatlabProxyObject, which
+    # can only exist once libpymcr has been imported (a fake backend need not import it)
+    proxy = sys.modules.get('libpymcr.MatlabProxyObject')
+    return proxy is not None and isinstance(value, proxy.MatlabProxyObject)
+
+
+def _is_matlab_handle(value):
+    calls = sys.modules.get('pace_neutrons._calls')
+    return calls is not None and isinstance(value, calls.MatlabHandle)
+
+
+def _to_worker(value, backend):
+    # Loads `MatlabBlob` arguments into the worker's session
+    if isinstance(value, MatlabBlob):
+        return value.load(backend)
+    elif isinstance(value, tuple):
+        return tuple(_to_worker(v, backend) for v in value)
+    elif isinstance(value, list):
+        return [_to_worker(v, backend) for v in value]
+    elif isinstance(value, dict):
+        return {k: _to_worker(v, backend) for k, v in value.items()}
+    return value
+
+
+def _from_worker(value, backend):
+    # Serialises MATLAB objects, which only exist in the worker's session, to `MatlabBlob`s
+    if _is_matlab_object(value):
+        stream = backend.getByteStreamFromArray(value, nargout=1)
+        return MatlabBlob(stream.tobytes(), backend.class_(value, nargout=1), _is_matlab_handle(value))
+    elif isinstance(value, tuple):
+        return tuple(_from_worker(v, backend) for v in value)
+    elif isinstance(value, list):
+        return [_from_worker(v, backend) for v in value]
+    elif isinstance(value, dict):
+        return {k: _from_worker(v, backend) for k, v in value.items()}
+    return value
+
+
+def _run(name, args, kwargs, nargout):
+    backend = _WORKER_BACKEND
+    func = backend
+    for part in name.split('.'):
+        func = getattr(func, part)
+    args = _to_worker(args, backend)
+    kwargs = _to_worker(kwargs, backend)
+    return _from_worker(func(*args, nargout=nargout, **kwargs), backend)
+
+
+def _run_star(name, nargout, args):
+    return _run(name, args, {}, nargout)
+
+
+class MatlabPool(object):
+    """
+    A pool of `n_workers` processes each running a MATLAB session.
+
+    The sessions are started when the first tasks are submitted and reused for all
+    later tasks. Use the pool as a context manager or call `shutdown` to stop them.
+
+    :param n_workers: The number of worker processes (default: the number of CPUs)
+    :param matlab_path: Path to the root directory of the MATLAB installation or MCR installation.
+    :param matlab_version: The version of MATLAB to use (see `pace_neutrons.Matlab`)
+    :param backend: A picklable callable `backend(matlab_path, matlab_version)` which creates
+        the session in each worker. Defaults to `start_matlab`; tests may substitute a fake.
+    """
+
+    def __init__(self, n_workers=None, matlab_path=None, matlab_version=None, backend=start_matlab):
+        self.n_workers = n_workers if n_workers else os.cpu_count()
+        # Workers must not inherit the parent's MATLAB session (which cannot be forked)
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.n_workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_initialize_worker, initargs=(backend, matlab_path, matlab_version))
+
+    def submit(self, name, *args, nargout=1, **kwargs):
+        """
+        Calls the MATLAB function `name` with the given arguments in a worker
+
+        :return: A `concurrent.futures.Future` for the result
+        """
+        return self._executor.submit(_run, name, args, kwargs, nargout)
+
+    def map(self, name, *iterables, nargout=1, chunksize=1, timeout=None):
+        """
+        Calls the MATLAB function `name` with arguments taken from each of the iterables in turn,
+        like the built-in `map`, spreading the calls over the workers.
+
+        :return: An iterator over the results, in order
+        """
+        return self._executor.map(functools.partial(_run_star, name, nargout), zip(*iterables),
+                                  chunksize=chunksize, timeout=timeout)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """Stops the workers once pending tasks are done (or cancelled if `cancel_futures`)"""
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown(wait=True, cancel_futures=exc_type is not None)
+        return False
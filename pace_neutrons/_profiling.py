@@ -0,0 +1,80 @@
+"""
+Timing of the phases of ``import pace_neutrons`` and ``Matlab()`` startup.
+
+Phases are recorded with monotonic timers by `TIMER` and reported by `startup_report()`.
+Phases timed by ``pace_neutrons_cli.utils.set_env`` before it restarts the interpreter
+are passed on in the ``PACE_STARTUP_TIMINGS`` environment variable.
+If ``PACE_STARTUP_REPORT`` is set to a file name, the report is written there as JSON
+once ``Matlab()`` has started.
+"""
+import os
+import sys
+import json
+import time
+import contextlib
+
+TIMINGS_ENV = 'PACE_STARTUP_TIMINGS'
+REPORT_ENV = 'PACE_STARTUP_REPORT'
+
+
+class StartupTimer(object):
+    def __init__(self):
+        self.phases = []
+        self.info = {}
+        self._depth = 0
+        try:
+            inherited = json.loads(os.environ.pop(TIMINGS_ENV, '[]'))
+        except ValueError:
+            inherited = []
+        for name, seconds in inherited:
+            self.add(name, seconds)
+
+    def add(self, name, seconds, depth=0):
+        self.phases.append({'phase': name, 'seconds': seconds, 'depth': depth})
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Times the enclosed block, nested phases are recorded with a larger depth"""
+        depth, self._depth = self._depth, self._depth + 1
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self._depth = depth
+            self.add(name, time.monotonic() - t0, depth)
+
+    def report(self):
+        total = sum(p['seconds'] for p in self.phases if p['depth'] == 0)
+        return StartupReport(phases=[dict(p) for p in self.phases], total_seconds=total, **self.info)
+
+    def dump(self):
+        filename = os.environ.get(REPORT_ENV)
+        if filename:
+            try:
+                with open(filename, 'w') as f:
+                    json.dump(self.report(), f, indent=1)
+            except OSError as err:
+                print(f'Could not write startup report to {filename}: {err}', file=sys.stderr)
+
+
+class StartupReport(dict):
+    """A dict of startup timings which prints as a table"""
+
+    def __str__(self):
+        lines = [f'{"  " * p["depth"] + p["phase"]:<40}{p["seconds"]:>10.3f} s' for p in self['phases']]
+        lines += ['-' * 52, f'{"total":<40}{self["total_seconds"]:>10.3f} s']
+        lines += [f'{k}: {v}' for k, v in self.items() if k not in ['phases', 'total_seconds']]
+        return '\n'.join(lines)
+
+
+TIMER = StartupTimer()
+
+
+def startup_report():
+    """
+    Returns the time spent in each phase of importing `pace_neutrons` and starting MATLAB.
+
+    The report is a dict with a list of `phases` (name, seconds and nesting depth) and the
+    `total_seconds` of the top level phases. Printing it shows a table.
+    """
+    return TIMER.report()
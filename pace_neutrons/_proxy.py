@@ -0,0 +1,153 @@
+"""
+Lazy proxies for the MATLAB objects returned by calls.
+
+The libpymcr proxy queries the class and methods of an object when it is created
+and the property names on every attribute access. A `LazyMatlabObject` gets
+these with one call (`describe` in ``call.m``) the first time they are needed, and
+fetches each property when it is first accessed. Scalar structs (e.g. the ``data``
+of an old-style sqw) are kept in MATLAB behind a proxy of their own, so that
+``w.data.s`` transfers only the signal array rather than the whole struct; this
+`LazyMatlabStruct` can also be used as a mapping of its fields.
+Properties of value objects and structs cannot change behind the proxy, so they
+are cached; those of handle objects are fetched on every access.
+"""
+from collections.abc import Mapping
+from libpymcr.MatlabProxyObject import MatlabProxyObject, DictPropertyWrapper, matlab_method
+from libpymcr.MatlabProxyObject import unwrap
+from libpymcr.utils import get_nlhs
+
+
+def wrap(inputs, interface):
+    """Converts the outputs of a MATLAB call like `libpymcr.MatlabProxyObject.wrap`, with lazy proxies"""
+    if 'matlab_wrapper' in str(type(inputs)):
+        return LazyMatlabObject(interface, inputs)
+    elif isinstance(inputs, tuple):
+        return tuple(wrap(v, interface) for v in inputs)
+    elif isinstance(inputs, list):
+        return [wrap(v, interface) for v in inputs]
+    elif isinstance(inputs, dict):
+        return {k: wrap(v, interface) for k, v in inputs.items()}
+    return inputs
+
+
+class _LazyMethod(matlab_method):
+    # A method of a `LazyMatlabObject`, whose results are also lazy proxies
+    def __call__(self, *args, **kwargs):
+        nreturn = max(get_nlhs(self.method), 1)
+        nargout = int(kwargs.pop('nargout') if 'nargout' in kwargs.keys() else nreturn)
+        args += sum(kwargs.items(), ())
+        args = unwrap(args, self.proxy.interface)
+        return wrap(self.proxy.interface.call(self.method, self.proxy.handle, *args, nargout=nargout),
+                    self.proxy.interface)
+
+
+class LazyMatlabObject(MatlabProxyObject):
+    """A proxy for a MATLAB object (or a struct kept in MATLAB) which fetches its properties on demand"""
+
+    def __init__(self, interface, handle, parent=None):
+        self.__dict__['handle'] = handle
+        self.__dict__['interface'] = interface
+        # The proxy and property this is the value of, which is updated when this is assigned to
+        self.__dict__['_parent'] = parent
+        self.__dict__['_description'] = None
+        self.__dict__['_cache'] = {}
+
+    def _describe(self):
+        if self._description is None:
+            classname, names, methods, is_handle = self.interface.call('_describe', self.handle, nargout=1)
+            self.__dict__['_description'] = (classname, list(names), list(methods), bool(is_handle))
+        return self._description
+
+    @property
+    def _class(self):
+        return self._describe()[0]
+
+    @property
+    def _methods(self):
+        return self._describe()[2]
+
+    def _getAttributeNames(self):
+        return self._describe()[1]
+
+    def _getMethodNames(self):
+        return self._describe()[2]
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if name in self._cache:
+            return self._cache[name]
+        _, names, methods, is_handle = self._describe()
+        if name in names:
+            is_struct, value = self.interface.call('_get_property', self.handle, name, nargout=1)
+            if is_struct:
+                value = LazyMatlabStruct(self.interface, value, (self, name))
+            else:
+                value = wrap(value, self.interface)
+                if isinstance(value, dict) or isinstance(value, list):
+                    value = DictPropertyWrapper(value, name, self)
+            if not is_handle:
+                self._cache[name] = value
+            return value
+        elif name in methods:
+            return _LazyMethod(self, name)
+        raise AttributeError(f"Matlab {self._class} has no property or method '{name}'")
+
+    def __setattr__(self, name, value):
+        self._cache.pop(name, None)
+        self.__dict__['handle'] = self.interface.call('_set_property', self.handle, name,
+                                                      unwrap(value, self.interface), nargout=1)
+        if self._parent is not None:
+            # Structs and value objects are copies, so the owner's property is set to the new value
+            parent, prop = self._parent
+            setattr(parent, prop, self)
+            if not parent._describe()[3]:
+                parent._cache[prop] = self
+
+    def __dir__(self):
+        return list(set(object.__dir__(self) + self._getAttributeNames() + self._getMethodNames()))
+
+    def __repr__(self):
+        return f'<proxy for Matlab {self._class} object>'
+
+
+class LazyMatlabStruct(LazyMatlabObject):
+    """
+    A proxy for a scalar struct kept in MATLAB, which is also a read-only `Mapping` of its fields
+    like the dict it would otherwise be converted to (``val`` gives that dict, as it did for the
+    `DictPropertyWrapper` which was returned before). Fields can be set by attribute or by key.
+    """
+
+    def __getattr__(self, name):
+        if name == 'val' and name not in self._getAttributeNames():
+            return dict(self.items())
+        return super().__getattr__(name)
+
+    def __getitem__(self, key):
+        if key not in self._getAttributeNames():
+            raise KeyError(key)
+        # Not getattr, so that fields with the names of the Mapping methods can be indexed
+        return LazyMatlabObject.__getattr__(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __iter__(self):
+        return iter(self._getAttributeNames())
+
+    def __len__(self):
+        return len(self._getAttributeNames())
+
+    def __contains__(self, key):
+        return key in self._getAttributeNames()
+
+    keys = Mapping.keys
+    items = Mapping.items
+    values = Mapping.values
+    get = Mapping.get
+
+    def __repr__(self):
+        return 'Matlab struct with fields:\n' + ''.join(f'    {k}: {v}\n' for k, v in self.items())
+
+
+Mapping.register(LazyMatlabStruct)
@@ -0,0 +1,187 @@
+"""
+The messages between a `MatlabClient` and the MATLAB server (``pace_neutrons_server``).
+
+Messages are pickled over a `multiprocessing.connection`, except numeric arrays of at least
+`SHARED_MEMORY_THRESHOLD` bytes, which are copied into shared memory blocks so that only
+their names cross the socket. Each side unlinks the blocks it created once the other side
+has copied them: the client when the reply to its request arrives, and the server when the
+client's next request arrives (or it disconnects).
+
+This module must not import libpymcr, as the client does not load the MATLAB runtime.
+"""
+import os
+import stat
+import tempfile
+import numpy as np
+from multiprocessing import shared_memory
+
+SHARED_MEMORY_THRESHOLD = 1 << 16
+# The blocks created by this process which have not been released
+_CREATED = set()
+
+
+class SharedArray(object):
+    """A numpy array in a shared memory block"""
+
+    def __init__(self, name, shape, dtype, order):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+        self.order = order
+
+
+class RemoteRef(object):
+    """A MATLAB object kept by the server, identified by `ref`"""
+
+    def __init__(self, ref):
+        self.ref = ref
+
+
+class RemoteMethod(object):
+    """Returned by the server when the attribute of an object is a method"""
+
+
+def runtime_dir():
+    """
+    The directory for the socket and key file of the server: ``pace_neutrons`` in XDG_RUNTIME_DIR,
+    or ``pace_neutrons-<uid>`` in the temporary directory, which is created readable only by this
+    user. Raises `PermissionError` if it exists but belongs to another user or others can use it.
+    """
+    if os.name == 'nt':
+        # The temporary directory is in the user's profile
+        return tempfile.gettempdir()
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        path = os.path.join(os.environ['XDG_RUNTIME_DIR'], 'pace_neutrons')
+    else:
+        path = os.path.join(tempfile.gettempdir(), f'pace_neutrons-{os.getuid()}')
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) & 0o077:
+        raise PermissionError(f'{path} must be a directory owned by and only accessible to the current user')
+    return path
+
+
+def default_address(address=None, authkey=None):
+    """
+    The server address (a socket in the `runtime_dir` or a named pipe on Windows, unless
+    `address` or the PACE_SERVER_ADDRESS environment variable is set) and authentication key
+    (PACE_SERVER_AUTHKEY, or the key file written next to the socket by the server)
+    """
+    if address is None:
+        address = os.environ.get('PACE_SERVER_ADDRESS')
+    if address is None:
+        if os.name == 'nt':
+            user = os.environ.get('USERNAME', 'pace')
+            address = rf'\\.\pipe\pace_neutrons_{user}'
+        else:
+            address = os.path.join(runtime_dir(), 'server.sock')
+    if authkey is None and 'PACE_SERVER_AUTHKEY' in os.environ:
+        authkey = os.environ['PACE_SERVER_AUTHKEY']
+    if isinstance(authkey, str):
+        authkey = authkey.encode()
+    return address, authkey
+
+
+def key_file(address):
+    """The file holding the authentication key of the server at `address`"""
+    if address.startswith('\\\\'):
+        return os.path.join(runtime_dir(), address.split('\\')[-1] + '.key')
+    return address + '.key'
+
+
+def write_key(keyfile, authkey):
+    """
+    Creates the key file, which must not exist, readable only by this user. A key file
+    left by a server of this user which did not shut down cleanly is replaced.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_NOFOLLOW', 0)
+    try:
+        fd = os.open(keyfile, flags, 0o600)
+    except FileExistsError:
+        if os.name != 'nt' and os.lstat(keyfile).st_uid != os.getuid():
+            raise PermissionError(f'The key file {keyfile} belongs to another user')
+        os.remove(keyfile)
+        fd = os.open(keyfile, flags, 0o600)
+    with open(fd, 'w') as f:
+        f.write(authkey.decode())
+
+
+def read_key(keyfile):
+    """
+    Reads the key written by `write_key`, raising `PermissionError` unless the file belongs to
+    this user and only they can read it (as the server is trusted by whoever has its key)
+    """
+    with open(os.open(keyfile, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))) as f:
+        if os.name != 'nt':
+            info = os.fstat(f.fileno())
+            if info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) != 0o600:
+                raise PermissionError(f'The key file {keyfile} must belong to the current user and have mode 0600')
+        return f.read().strip().encode()
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # Before Python 3.13 the resource tracker of this process would also unlink the block
+        block = shared_memory.SharedMemory(name)
+        if os.name == 'posix' and name not in _CREATED:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(block._name, 'shared_memory')
+        return block
+
+
+def encode(value, blocks, encode_object=None):
+    """
+    Replaces large arrays in `value` by `SharedArray`s, appending the blocks created to
+    `blocks`, and other values which cannot be pickled by ``encode_object(value)``
+    """
+    if isinstance(value, np.ndarray) and value.nbytes >= SHARED_MEMORY_THRESHOLD and not value.dtype.hasobject:
+        order = 'F' if value.flags.f_contiguous and not value.flags.c_contiguous else 'C'
+        block = shared_memory.SharedMemory(create=True, size=value.nbytes)
+        blocks.append(block)
+        _CREATED.add(block.name)
+        np.ndarray(value.shape, value.dtype, buffer=block.buf, order=order)[...] = value
+        return SharedArray(block.name, value.shape, value.dtype.str, order)
+    elif isinstance(value, tuple):
+        return tuple(encode(v, blocks, encode_object) for v in value)
+    elif isinstance(value, list):
+        return [encode(v, blocks, encode_object) for v in value]
+    elif isinstance(value, dict):
+        return {k: encode(v, blocks, encode_object) for k, v in value.items()}
+    elif encode_object is not None:
+        return encode_object(value)
+    return value
+
+
+def decode(value, decode_object=None):
+    """Copies `SharedArray`s in `value` out of shared memory, and replaces `RemoteRef`s by ``decode_object(ref)``"""
+    if isinstance(value, SharedArray):
+        block = _attach(value.name)
+        shared = np.ndarray(value.shape, np.dtype(value.dtype), buffer=block.buf, order=value.order)
+        array = shared.copy(order=value.order)
+        # The block cannot be closed while an array refers to its buffer
+        del shared
+        block.close()
+        return array
+    elif isinstance(value, RemoteRef) and decode_object is not None:
+        return decode_object(value)
+    elif isinstance(value, tuple):
+        return tuple(decode(v, decode_object) for v in value)
+    elif isinstance(value, list):
+        return [decode(v, decode_object) for v in value]
+    elif isinstance(value, dict):
+        return {k: decode(v, decode_object) for k, v in value.items()}
+    return value
+
+
+def release(blocks):
+    """Frees the shared memory blocks created by `encode`"""
+    for block in blocks:
+        block.close()
+        block.unlink()
+        _CREATED.discard(block.name)
+    del blocks[:]
@@ -0,0 +1,135 @@
+import sys, os
+import argparse
+import threading
+import itertools
+from .utils import set_env
+
+def _get_args():
+    parser = argparse.ArgumentParser(description='Runs a MATLAB session which pace_neutrons.MatlabClient connects to')
+    parser.add_argument('-d', '--matlab-dir', help='Directory where Matlab MCR is installed')
+    parser.add_argument('-v', '--matlab-version', help='Version of Matlab to use, e.g. 2021b')
+    parser.add_argument('-a', '--address', help='Socket (or named pipe on Windows) to listen on')
+    return parser
+
+
+def _handle(m, kind, payload):
+    from libpymcr.MatlabProxyObject import matlab_method
+    from pace_neutrons._transport import RemoteMethod
+    if kind == 'call':
+        name, args, kwargs, nargout = payload
+        func = m
+        for part in name.split('.'):
+            func = getattr(func, part)
+        return func(*args, nargout=nargout, **kwargs)
+    obj = payload[0]
+    if kind == 'getattr':
+        value = getattr(obj, payload[1])
+        return RemoteMethod() if isinstance(value, matlab_method) else value
+    elif kind == 'method':
+        name, args, kwargs, nargout = payload[1:]
+        return getattr(obj, name)(*args, nargout=nargout, **kwargs)
+    elif kind == 'setattr':
+        setattr(obj, payload[1], payload[2])
+    elif kind == 'getitem':
+        return obj[payload[1]]
+    elif kind == 'len':
+        return len(obj)
+    elif kind == 'dir':
+        return dir(obj)
+    elif kind == 'repr':
+        return repr(obj)
+    else:
+        raise ValueError(f'Unknown request {kind}')
+
+
+def serve_client(m, conn):
+    # Objects returned to this client, kept until it deletes them or disconnects
+    from libpymcr.MatlabProxyObject import MatlabProxyObject, DictPropertyWrapper
+    from pace_neutrons._transport import RemoteRef, encode, decode, release
+    objects = {}
+    refs = itertools.count(1)
+    blocks = []
+    def encode_object(value):
+        if isinstance(value, DictPropertyWrapper):
+            return encode(value.val, blocks, encode_object)
+        elif isinstance(value, MatlabProxyObject):
+            ref = next(refs)
+            objects[ref] = value
+            return RemoteRef(ref)
+        return value
+    try:
+        while True:
+            try:
+                kind, released, payload = conn.recv()
+            except EOFError:
+                break
+            # The client has copied the arrays of the last reply
+            release(blocks)
+            for ref in released:
+                objects.pop(ref, None)
+            try:
+                result = _handle(m, kind, decode(payload, lambda value: objects[value.ref]))
+                reply = ('ok', encode(result, blocks, encode_object))
+            except Exception as err:
+                reply = ('error', err)
+            try:
+                conn.send(reply)
+            except Exception as err:
+                # e.g. the result or error cannot be pickled
+                conn.send(('error', RuntimeError(f'{type(err).__name__}: {err}')))
+    finally:
+        release(blocks)
+        conn.close()
+
+
+def serve(m, address=None, authkey=None):
+    from multiprocessing import AuthenticationError
+    from multiprocessing.connection import Listener, Client
+    from pace_neutrons._transport import default_address, key_file, write_key
+    address, authkey = default_address(address, authkey)
+    if not address.startswith('\\\\') and os.path.exists(address):
+        # Removes the socket left by a server which did not shut down cleanly
+        try:
+            Client(address, authkey=b'').close()
+        except ConnectionRefusedError:
+            os.remove(address)
+        except Exception:
+            raise RuntimeError(f'A server is already running at {address}')
+    keyfile = None
+    if authkey is None:
+        authkey = os.urandom(16).hex().encode()
+        keyfile = key_file(address)
+        write_key(keyfile, authkey)
+    listener = Listener(address, authkey=authkey)
+    print(f'Serving Matlab at {address}')
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError, AuthenticationError) as err:
+                # A client which failed to authenticate
+                print(f'Connection refused: {err}')
+                continue
+            threading.Thread(target=serve_client, args=(m, conn), daemon=True).start()
+    finally:
+        listener.close()
+        if keyfile is not None and os.path.exists(keyfile):
+            os.remove(keyfile)
+
+
+def main(args=None):
+    args = _get_args().parse_args(args if args else sys.argv[1:])
+    if args.matlab_dir is not None:
+        os.environ['PACE_MCR_DIR'] = args.matlab_dir
+    # Run set env first before any more imports because we might need to restart the process
+    set_env()
+    import pace_neutrons
+    matlab_version = args.matlab_version if args.matlab_version else os.environ.get('PACE_MCR_VERSION')
+    if matlab_version is not None:
+        # set_env gives the release (e.g. 'R2021b') but the CTFs are named by version ('2021b')
+        matlab_version = matlab_version[1:] if matlab_version.startswith('R') else matlab_version
+    m = pace_neutrons.Matlab(matlab_path=args.matlab_dir, matlab_version=matlab_version)
+    try:
+        serve(m, args.address)
+    except KeyboardInterrupt:
+        pass
@@ -19,19 +19,19 @@ def get_mlpath():
             raise RuntimeError(f'Matlab MCR library not found in installation at {os.environ["PACE_MCR_DIR"]}')
         ver = mcllib[0].split('mclmcrrt')[1].split('.')[0].replace('_','.')
         return os.environ['PACE_MCR_DIR'], RVERS[ver]
-    import pace_neutrons, libpymcr
+    import pace_neutrons
     if pace_neutrons.INITIALIZED:
-        with pace_neutrons.nostdout():
-            ver = pace_neutrons.VERSION
-            mlPath = libpymcr.utils.checkPath(ver)
-    else:
-        mcr_found = False
-        for version in pace_neutrons._VERSIONS:
-            ver = version['version']
+        import libpymcr
+        ver = pace_neutrons.VERSION
+        # libpymcr records the root of the runtime it loaded
+        mlPath = os.environ.get('LIBPYMCR_MATLAB_ROOT')
+        if mlPath is None:
             with pace_neutrons.nostdout():
-                mlPath = libpymcr.utils.checkPath(ver, error_if_not_found=False)
-            if mlPath is not None:
-                break
+                mlPath = libpymcr.utils.checkPath(f'R{ver}')
+    else:
+        # Uses the cached MATLAB locations rather than probing every version
+        avail_ML = pace_neutrons._checkML(pace_neutrons._VERSIONS)
+        mlPath, ver = (avail_ML[0]['root'], avail_ML[0]['version']) if avail_ML else (None, None)
     if mlPath is None:
         raise RuntimeError('Could not find Matlab MCR in known locations.\n' \
                            'Please rerun with the environment variable ' \
@@ -43,7 +43,11 @@ def set_env():
     # If the environment variables are not set, we need to restart with execv
     if PATHVAR[OS] in os.environ and OSTYPE[OS] in os.environ[PATHVAR[OS]]:
         return
+    import time, json
+    t0 = time.monotonic()
     mlPath, mlver = get_mlpath()
+    # Timings are passed to the restarted interpreter for `pace_neutrons.startup_report`
+    os.environ['PACE_STARTUP_TIMINGS'] = json.dumps([['set_env get_mlpath', time.monotonic() - t0]])
     os.environ['PACE_MCR_VERSION'] = mlver
     ldpath = os.path.join(mlPath, 'bin', OSTYPE[OS])
     if PATHVAR[OS] not in os.environ:
@@ -151,6 +155,22 @@ class PaceConfiguration(object):
     def IsFirstRun(self, val):
         self.config['pace']['IsFirstRun'] = str(val)
 
+    @property
+    def HoraceInitState(self):
+        # Result of `pyhorace_init` for the CTF / Matlab combination identified by the 'key' entry
+        import json
+        try:
+            return json.loads(self.config['pace']['HoraceInitState'])
+        except (KeyError, ValueError):
+            return None
+
+    @HoraceInitState.setter
+    def HoraceInitState(self, val):
+        import json
+        if not isinstance(val, dict):
+            raise RuntimeError('Cached Horace initialisation state must be a dict')
+        self.config['pace']['HoraceInitState'] = json.dumps(val)
+
     def save(self):
         with open(self.config_file, 'w') as f:
             self.config.write(f)
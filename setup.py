@@ -168,7 +168,8 @@ KEYWORDARGS = dict(
     cmdclass=versioneer.get_cmdclass(),
     entry_points={'console_scripts': [
         'pace_neutrons = pace_neutrons_cli:main',
-        'worker_v4 = pace_neutrons_cli.worker:main']},
+        'worker_v4 = pace_neutrons_cli.worker:main',
+        'pace_neutrons_server = pace_neutrons_cli.server:main']},
     url="https://github.com/pace-neutrons/pace-python",
     zip_safe=False,
     classifiers=[
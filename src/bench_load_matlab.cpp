@@ -0,0 +1,52 @@
+/* Microbenchmark of the Matlab runtime function lookup in load_matlab.cpp and of array creation.
+ * Compares resolving get_function_ptr with dlsym on every call (as load_matlab.cpp used to do)
+ * with the symbol table populated by _loadlibraries.
+ *
+ * Usage: bench_load_matlab <matlabroot> [n_iterations]
+ * (<matlabroot> defaults to the LIBPYMCR_MATLAB_ROOT environment variable)
+ */
+#include "load_matlab.hpp"
+#include <chrono>
+#include <cstdlib>
+#include <iostream>
+
+void* get_function_ptr(int fcn);
+
+template <typename F> double _time_per_call(F fn, size_t n) {
+    auto t0 = std::chrono::steady_clock::now();
+    for (size_t i = 0; i < n; i++) {
+        fn(i);
+    }
+    std::chrono::duration<double> dt = std::chrono::steady_clock::now() - t0;
+    return dt.count() / n;
+}
+
+void _report(const char* name, double seconds) {
+    std::cout << name << ": " << seconds * 1e9 << " ns/call (" << 1. / seconds << " calls/s)" << std::endl;
+}
+
+int main(int argc, char** argv) {
+    const char* envroot = std::getenv("LIBPYMCR_MATLAB_ROOT");
+    std::string mlroot = argc > 1 ? argv[1] : (envroot ? envroot : "");
+    if (mlroot.empty()) {
+        std::cerr << "Usage: bench_load_matlab <matlabroot> [n_iterations]" << std::endl;
+        return 1;
+    }
+    size_t n = argc > 2 ? std::stoul(argv[2]) : 1000000;
+    _loadlibraries(mlroot);
+    void* libdataarray = _loadlib(mlroot + "/extern/bin/", "libMatlabDataArray");
+    void* volatile sink = nullptr;
+
+    _report("get_function_ptr with dlsym per call", _time_per_call([&](size_t) {
+        sink = ((void*(*)(int))_resolve(libdataarray, "get_function_ptr"))(0); }, n));
+    _report("get_function_ptr from symbol table", _time_per_call([&](size_t) {
+        sink = get_function_ptr(0); }, n));
+
+    matlab::data::ArrayFactory factory;
+    _report("create scalar array", _time_per_call([&](size_t i) {
+        matlab::data::TypedArray<double> arr = factory.createScalar<double>(static_cast<double>(i)); }, n));
+    _report("create 1x16 array", _time_per_call([&](size_t) {
+        matlab::data::TypedArray<double> arr = factory.createArray<double>({1, 16}); }, n / 10));
+    (void)sink;
+    return 0;
+}
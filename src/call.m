@@ -1,9 +1,37 @@
 function [varargout] = call(name, varargin)
     if strcmp(name, '_call_python')
+        % Calls by name from Matlab code (e.g. pyclasswrapper) use the pointers set at startup
+        varargout = call_python_m(python_ptrs(), varargin{:});
+        return
+    elseif strcmp(name, '_call_python_ptrs')
+        % Python functions passed to Matlab (see unwrap) carry their own pointers
         varargout = call_python_m(varargin{:});
         return
+    elseif strcmp(name, '_set_python_ptrs')
+        % Called at startup with a Python function, so Matlab code can call Python by name
+        python_ptrs([varargin{1}.mex_func_ptr, varargin{1}.conv_ptr]);
+        return
+    elseif strcmp(name, '_call_batch')
+        varargout = {call_batch(varargin{:})};
+        return
+    elseif strcmp(name, '_call_handle')
+        [boxed, outs] = call_handle(varargin{:});
+        varargout = {boxed, outs};
+        return
+    elseif strcmp(name, '_wrap_scans')
+        % For tests, the number of classes whose members wrap has scanned
+        varargout = {has_thin_members()};
+        return
+    elseif strcmp(name, '_describe')
+        varargout = {describe(unwrap(varargin{1}))};
+        return
+    elseif strcmp(name, '_get_property')
+        varargout = {get_property(unwrap(varargin{1}), varargin{2})};
+        return
+    elseif strcmp(name, '_set_property')
+        varargout = {set_property(varargin{:})};
+        return
     end
-    resultsize = nargout;
     if nargin == 1
         args = {};
     else
@@ -12,42 +40,160 @@ function [varargout] = call(name, varargin)
     for ir = 1:numel(args)
         args{ir} = unwrap(args{ir});
     end
+    % Limit the number of outputs before the call so the function is only run once.
+    % Function handles (e.g. called through a proxy) are not looked up, nor are functions
+    % called with objects, as feval may dispatch to a method which shadows the function
+    % (e.g. plot of an sqw) and has more outputs: these are retried with fewer outputs.
+    maxresultsize = NaN;
+    if (ischar(name) || isstring(name)) && ~any(cellfun(@isobject, args))
+        maxresultsize = max_nargout(char(name));
+    end
+    resultsize = nargout;
+    if maxresultsize >= 0
+        resultsize = min(resultsize, maxresultsize);
+    end
     if resultsize > 0
         % call the function with the given number of
         % output arguments:
-        varargout = cell(resultsize, 1);
+        varargout = cell(nargout, 1);
         try
-            [varargout{:}] = feval(name, args{:});
+            [varargout{1:resultsize}] = feval(name, args{:});
         catch err
             if (strcmp(err.identifier,'MATLAB:unassignedOutputs'))
-                varargout = eval_ans(name, args);
-            elseif strcmp(err.identifier,'MATLAB:TooManyOutputs')
-                try
-                    maxresultsize = max([nargout(name), 0]);
-                catch
-                    maxresultsize = 1;  % Default to one output
-                end
-                [varargout{1:maxresultsize}] = feval(name, args{:});
+                % The function has already run, so return empty outputs rather than rerun it
+                varargout = cell(nargout, 1);
+            elseif strcmp(err.identifier,'MATLAB:TooManyOutputs') && isnan(maxresultsize)
+                % nargout was not used (for methods, function handles or calls with objects)
+                varargout = call_fewer_outputs(name, args, resultsize - 1, nargout);
             else
                 rethrow(err);
             end
         end
     else
         varargout = eval_ans(name, args);
+        varargout(end+1:nargout) = {[]};
     end
     for ir = 1:numel(varargout)
         varargout{ir} = wrap(varargout{ir});
     end
 end
 
+function results = call_batch(names, counts, varargin)
+    % Runs several calls in order. names are separated by newlines, counts holds
+    % the nargout and number of arguments of each call and varargin the arguments
+    % of all the calls. An argument struct with a pace_batch_ref field refers to
+    % the first output of an earlier call. Errors are returned rather than raised.
+    names = strsplit(names, newline);
+    counts = reshape(double(counts), 2, []);
+    results = cell(1, numel(names));
+    iarg = 0;
+    for ic = 1:numel(names)
+        args = varargin(iarg + (1:counts(2, ic)));
+        iarg = iarg + counts(2, ic);
+        try
+            for ia = 1:numel(args)
+                if isstruct(args{ia}) && isfield(args{ia}, 'pace_batch_ref')
+                    ref = results{args{ia}.pace_batch_ref};
+                    if ~ref{1} || isempty(ref{2})
+                        error('pace:batch:badReference', ...
+                              'Argument %d refers to call %d which failed or has no output', ...
+                              ia, args{ia}.pace_batch_ref - 1);
+                    end
+                    args{ia} = ref{2}{1};
+                end
+            end
+            outs = cell(1, counts(1, ic));
+            if isempty(outs)
+                call(names{ic}, args{:});
+            else
+                [outs{:}] = call(names{ic}, args{:});
+            end
+            results{ic} = {true, outs};
+        catch err
+            results{ic} = {false, err.identifier, err.message};
+        end
+    end
+end
+
+function [boxed, outs] = call_handle(threshold, n, name, varargin)
+    % Calls name with n outputs, and keeps those which are not objects and take at
+    % least threshold bytes in MATLAB, boxed in a containers.Map (see unwrap).
+    outs = cell(1, n);
+    if isempty(outs)
+        call(name, varargin{:});
+    else
+        [outs{:}] = call(name, varargin{:});
+    end
+    boxed = false(1, n);
+    for ir = 1:n
+        out = outs{ir};
+        info = whos('out');
+        if ~isobject(out) && info.bytes >= threshold
+            outs{ir} = containers.Map({'pace_handle'}, {out});
+            boxed(ir) = true;
+        end
+    end
+end
+
+function out = describe(obj)
+    % The class, field and property names and methods of obj, and whether it is a
+    % handle object, which a Python proxy needs before it can fetch any property.
+    try
+        names = fieldnames(obj);
+    catch
+        names = {};
+    end
+    meths = {};
+    if isobject(obj)
+        try
+            names = union(names, properties(obj), 'stable');
+        end
+        meths = methods(obj);
+    end
+    out = {class(obj), names(:)', meths(:)', isa(obj, 'handle')};
+end
+
+function out = get_property(obj, name)
+    % A property or field of obj. Scalar structs are kept in MATLAB (boxed as by
+    % call_handle) so that a proxy can fetch their fields one at a time.
+    val = subsref(obj, struct('type', '.', 'subs', name));
+    is_struct = isstruct(val) && isscalar(val);
+    if is_struct
+        val = containers.Map({'pace_handle'}, {val});
+    else
+        val = wrap(val);
+    end
+    out = {is_struct, val};
+end
+
+function out = set_property(obj, name, value)
+    % Sets a property or field of obj (an object or a boxed struct) and returns the
+    % new value of obj, boxed in the same way.
+    out = subsasgn(unwrap(obj), struct('type', '.', 'subs', name), unwrap(value));
+    if isa(obj, 'containers.Map') && isKey(obj, 'pace_handle')
+        out = containers.Map({'pace_handle'}, {out});
+    else
+        out = wrap(out);
+    end
+end
+
 function out = unwrap(in_obj)
     out = in_obj;
     if isstruct(in_obj) && isfield(in_obj, 'libpymcr_func_ptr')
-        out = @(varargin) call('_call_python', in_obj.libpymcr_func_ptr, [in_obj.mex_func_ptr, in_obj.conv_ptr], varargin{:});
+        ptrs = python_ptrs([in_obj.mex_func_ptr, in_obj.conv_ptr]);
+        key = in_obj.libpymcr_func_ptr;
+        out = @(varargin) call('_call_python_ptrs', ptrs, key, varargin{:});
     elseif isa(in_obj, 'containers.Map') && in_obj.isKey('wrapped_oldstyle_class')
         out = in_obj('wrapped_oldstyle_class');
+    elseif isa(in_obj, 'containers.Map') && in_obj.isKey('pace_handle')
+        % A value kept in MATLAB by call_handle
+        out = unwrap(in_obj('pace_handle'));
     elseif iscell(in_obj)
-        for ii = 1:numel(in_obj)
+        % Only structs (Python functions), maps (old-style classes) and cells need unwrapping,
+        % so cells of e.g. file names or arrays are not walked element by element
+        idx = find(cellfun('isclass', in_obj, 'struct') | cellfun('isclass', in_obj, 'cell') ...
+                   | cellfun('isclass', in_obj, 'containers.Map'));
+        for ii = idx(:)'
             out{ii} = unwrap(in_obj{ii});
         end
     end
@@ -58,7 +204,10 @@ function out = wrap(obj)
     if isobject(obj) && (isempty(metaclass(obj)) && ~isjava(obj)) || has_thin_members(obj)
         out = containers.Map({'wrapped_oldstyle_class'}, {obj});
     elseif iscell(obj)
-        for ii = 1:numel(obj)
+        % Only objects, structs and cells can need wrapping
+        idx = find(cellfun('isclass', obj, 'struct') | cellfun('isclass', obj, 'cell') ...
+                   | cellfun(@isobject, obj));
+        for ii = idx(:)'
             out{ii} = wrap(obj{ii});
         end
     end
@@ -66,26 +215,54 @@ end
 
 function out = has_thin_members(obj)
 % Checks whether any member of a class or struct is an old-style class
-% or is already a wrapped instance of such a class
+% or is already a wrapped instance of such a class.
+% The result is cached for each class (or struct) and set of member classes, so an
+% instance whose members are of other classes (e.g. empty in the first instance seen)
+% is scanned again. Without an argument, returns the number of scans so far.
+    persistent cache scans
+    if isempty(cache)
+        cache = containers.Map('KeyType', 'char', 'ValueType', 'logical');
+        scans = 0;
+    end
+    if nargin == 0
+        out = scans;
+        return;
+    end
     out = false;
-    if isobject(obj) || isstruct(obj)
+    if isstruct(obj)
+        if isempty(obj)
+            return;
+        end
+        members = struct2cell(obj(1));
+    elseif isobject(obj)
         try
             fn = fieldnames(obj);
         catch
-            return;
+            fn = {};
         end
+        members = cell(numel(fn), 1);
         for ifn = 1:numel(fn)
-            try
-                mem = subsref(obj, struct('type', '.', 'subs', fn{ifn}));
-            catch
-                continue;
-            end
-            if (isempty(metaclass(mem)) && ~isjava(mem))
-                out = true;
-                break;
+            try %#ok<TRYNC>
+                members{ifn} = subsref(obj, struct('type', '.', 'subs', fn{ifn}));
             end
         end
+    else
+        return;
     end
+    classes = cellfun(@class, members, 'UniformOutput', false);
+    key = [class(obj) ':' sprintf('%s,', classes{:})];
+    if isKey(cache, key)
+        out = cache(key);
+        return;
+    end
+    scans = scans + 1;
+    for ii = 1:numel(members)
+        if (isempty(metaclass(members{ii})) && ~isjava(members{ii}))
+            out = true;
+            break;
+        end
+    end
+    cache(key) = out;
 end
 
 function results = eval_ans(name, args)
@@ -99,45 +276,100 @@ function results = eval_ans(name, args)
     end
 end
 
-function [n, undetermined] = getArgOut(name, parent)
-    undertermined = false;
-    if isstring(name)
-        fun = str2func(name);
+function results = call_fewer_outputs(name, args, n, nout)
+    % The number of outputs is checked before the function runs, so it is called
+    % with one fewer output at a time until it accepts them. This is not memoised
+    % as methods of different classes can have the same name.
+    results = cell(nout, 1);
+    while n > 0
         try
-            n = nargout(fun);
-        catch % nargout fails if fun is a method:
-            try
-                n = nargout(name);
-            catch
-                n = 0;
-                undetermined = true;
+            [results{1:n}] = feval(name, args{:});
+            return;
+        catch err
+            if strcmp(err.identifier, 'MATLAB:unassignedOutputs')
+                % The function has run, so return empty outputs rather than rerun it
+                results = cell(nout, 1);
+                return;
+            elseif ~strcmp(err.identifier, 'MATLAB:TooManyOutputs')
+                rethrow(err);
             end
         end
+        n = n - 1;
+    end
+    results = eval_ans(name, args);
+    results(end+1:nout) = {[]};
+end
+
+function n = max_nargout(name)
+    % Returns the maximum number of outputs of a function (negative if it uses
+    % varargout, NaN if it cannot be determined), memoised for each name.
+    persistent cache
+    if isempty(cache)
+        cache = containers.Map('KeyType', 'char', 'ValueType', 'double');
+    end
+    if isKey(cache, name)
+        n = cache(name);
     else
+        try
+            n = nargout(name);
+        catch % nargout fails if name is a method:
+            n = NaN;
+        end
+        cache(name) = n;
+    end
+end
+
+function [n, undetermined] = getArgOut(name, parent)
+    n = max_nargout(char(name));
+    undetermined = ~(n >= 0);
+    if undetermined
         n = 0;
-        undetermined = true;
     end
 end
 
-function out = call_python_m(varargin)
-    % Convert row vectors to column vectors for better conversion to numpy
-    for ii = 1:numel(varargin)
-        if size(varargin{ii}, 1) == 1
-            varargin{ii} = varargin{ii}';
-        end
+function out = call_python_m(ptrs, fun, varargin)
+    % Calls the Python function fun (its key in libpymcr._globalFunctionDict) with the
+    % pointers ptrs to the libpymcr functions. Row vectors are not transposed here (which
+    % would copy them): the function is called through call_python_columns (in
+    % FunctionWrapper.py) which turns them into column vectors with a strided numpy view
+    [kw_args, remaining_args] = get_kw_args(varargin);
+    % Wrapped Python objects are passed as struct('pace_pyobj', handle) markers, with their
+    % positions and keywords listed so Python resolves them without scanning every argument.
+    % Only the arguments themselves are checked (not the contents of cells and structs), so
+    % this costs the same however much data the arguments hold.
+    ipos = find(cellfun(@(a) isa(a, 'pyclasswrapper'), remaining_args));
+    for ii = ipos
+        remaining_args{ii} = struct('pace_pyobj', remaining_args{ii}.pyObjectString);
+    end
+    ikw = 2 * find(cellfun(@(a) isa(a, 'pyclasswrapper'), kw_args(2:2:end)));
+    for ii = ikw
+        kw_args{ii} = struct('pace_pyobj', kw_args{ii}.pyObjectString);
+    end
+    if ~isempty(ipos) || ~isempty(ikw)
+        kw_args = [kw_args {'pace_pyobj_args', int64(ipos - 1), 'pace_pyobj_kwargs', {kw_args(ikw - 1)}}];
     end
-    fun_name = varargin{1};
-    ptrs = varargin{2};
-    [kw_args, remaining_args] = get_kw_args(varargin(3:end));
     if ~isempty(kw_args)
         remaining_args = [remaining_args {struct('pyHorace_pyKwArgs', 1, kw_args{:})}];
     end
-    out = call_python(fun_name, ptrs, remaining_args{:});
+    out = call_python('call_python_columns', ptrs, fun, remaining_args{:});
     if ~iscell(out)
         out = {out};
     end
 end
 
+function ptrs = python_ptrs(ptrs)
+    % The pointers to the libpymcr functions which call Python, remembered from
+    % the Python functions passed to Matlab (with an argument, sets them).
+    persistent cached
+    if nargin > 0
+        cached = ptrs;
+    elseif isempty(cached)
+        error('pace:call_python:noPointers', 'No Python function has been passed to Matlab yet');
+    else
+        ptrs = cached;
+    end
+end
+
 function [kw_args, remaining_args] = get_kw_args(args)
     % Finds the keyword arguments (string, val) pairs, assuming that they always at the end (last 2n items)
     first_kwarg_id = numel(args) + 1;
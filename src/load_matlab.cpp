@@ -3,6 +3,7 @@
 // Global declaration of libraries
 void *_LIBDATAARRAY, *_LIBMEX, *_LIBCPPSHARED;
 std::string _MLVERSTR;
+void _resolve_symbols();
 
 void *_loadlib(std::string path, const char* libname, std::string mlver) {
 #if defined _WIN32
@@ -53,6 +54,7 @@ double _loadlibraries(std::string matlabroot) {
         _LIBDATAARRAY = _loadlib(matlabroot + "/extern/bin/", "libMatlabDataArray");
         _LIBCPPSHARED = _loadlib(matlabroot + "/runtime/", "libMatlabCppSharedLib", mlver);
         _LIBMEX = _loadlib(matlabroot + "/bin/", "libmex");
+        _resolve_symbols();
     }
     char *end;
 #ifdef _WIN32
@@ -61,64 +63,141 @@ double _loadlibraries(std::string matlabroot) {
     return std::strtod(mlver.c_str(), &end);
 #endif
 }
-void _checklibs() {
-    if (!_LIBDATAARRAY || !_LIBCPPSHARED || !_LIBMEX) {
-        throw std::runtime_error("Matlab libraries must be initialised first.");
+// Pointers to the Matlab runtime functions, resolved once by _loadlibraries
+static struct {
+    // Utils
+    void (*util_destroy_utf8)(char*);
+    void (*util_destroy_utf16)(char16_t*);
+    void (*util_utf8_to_utf16)(const char*, char16_t**, size_t*);
+    void (*util_utf16_to_utf8)(const char16_t*, char**, size_t*);
+    // CPP_SHARED_LIB
+    void (*runtime_create_session)(char16_t**, size_t);
+    void (*runtime_terminate_session)();
+    uint64_t (*create_mvm_instance_async)(const char16_t*);
+    uint64_t (*create_mvm_instance)(const char16_t*, bool*);
+    void (*terminate_mvm_instance)(const uint64_t);
+    void (*wait_for_figures_to_close)(const uint64_t);
+    void (*cppsharedlib_destroy_handles)(uintptr_t*);
+    uintptr_t (*cppsharedlib_feval_with_completion)(const uint64_t, const char*, size_t, bool,
+                                                    matlab::data::impl::ArrayImpl**, size_t,
+                                                    void(*)(void*, size_t, bool, matlab::data::impl::ArrayImpl**),
+                                                    void(*)(void*, size_t, bool, size_t, const void*), void*, void*, void*,
+                                                    void(*)(void*, const char16_t*, size_t), void(*)(void*));
+    bool (*cppsharedlib_cancel_feval_with_completion)(uintptr_t, bool);
+    void (*cppsharedlib_destroy_task_handle)(uintptr_t);
+    size_t (*cppsharedlib_get_stacktrace_number)(const uintptr_t);
+    const char* (*cppsharedlib_get_stacktrace_message)(const uintptr_t);
+    const char16_t* (*cppsharedlib_get_stackframe_file)(const uintptr_t, size_t);
+    const char* (*cppsharedlib_get_stackframe_func)(const uintptr_t, size_t);
+    uint64_t (*cppsharedlib_get_stackframe_line)(const uintptr_t, size_t);
+    int (*cppsharedlib_run_main)(int(*)(int, const char**), int, const char**);
+    // DATA_ARRAY
+    void* (*get_function_ptr)(int);
+    // MEX
+    void* (*mexGetFunctionImpl)();
+    void (*mexDestroyFunctionImpl)(void*);
+} _SYMBOLS;
+// Names of the symbols which could not be resolved
+std::string _MISSING;
+
+template <typename T> void _resolve_symbol(T &fptr, void* lib, const char* sym) {
+    fptr = reinterpret_cast<T>(_resolve(lib, sym));
+    if (!fptr) {
+        _MISSING += (_MISSING.empty() ? "" : ", ") + std::string(sym);
     }
 }
+#define RESOLVE_SYMBOL(lib, sym) _resolve_symbol(_SYMBOLS.sym, lib, #sym)
+
+void _resolve_symbols() {
+    _MISSING.clear();
+    RESOLVE_SYMBOL(_LIBCPPSHARED, util_destroy_utf8);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, util_destroy_utf16);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, util_utf8_to_utf16);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, util_utf16_to_utf8);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, runtime_create_session);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, runtime_terminate_session);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, create_mvm_instance_async);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, create_mvm_instance);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, terminate_mvm_instance);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, wait_for_figures_to_close);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, cppsharedlib_destroy_handles);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, cppsharedlib_feval_with_completion);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, cppsharedlib_cancel_feval_with_completion);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, cppsharedlib_destroy_task_handle);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, cppsharedlib_get_stacktrace_number);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, cppsharedlib_get_stacktrace_message);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, cppsharedlib_get_stackframe_file);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, cppsharedlib_get_stackframe_func);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, cppsharedlib_get_stackframe_line);
+    RESOLVE_SYMBOL(_LIBCPPSHARED, cppsharedlib_run_main);
+    RESOLVE_SYMBOL(_LIBDATAARRAY, get_function_ptr);
+    RESOLVE_SYMBOL(_LIBMEX, mexGetFunctionImpl);
+    RESOLVE_SYMBOL(_LIBMEX, mexDestroyFunctionImpl);
+    // The mex cannot work at all without these, the others are only needed when called
+    if (!_SYMBOLS.get_function_ptr || !_SYMBOLS.mexGetFunctionImpl || !_SYMBOLS.mexDestroyFunctionImpl) {
+        throw std::runtime_error("Matlab runtime symbols not found: " + _MISSING);
+    }
+}
+
+// Returns a resolved function pointer, or throws if it is not available
+template <typename T> T _symbol(T fptr) {
+    if (!fptr) {
+        if (!_LIBDATAARRAY || !_LIBCPPSHARED || !_LIBMEX) {
+            throw std::runtime_error("Matlab libraries must be initialised first.");
+        }
+        throw std::runtime_error("Matlab runtime symbols not found: " + _MISSING);
+    }
+    return fptr;
+}
+
 // Utils
-void util_destroy_utf8(char* utf8) { _checklibs(); return ((void(*)(char*))_resolve(_LIBCPPSHARED, "util_destroy_utf8"))(utf8); }
-void util_destroy_utf16(char16_t* utf16) { _checklibs(); return ((void(*)(char16_t*))_resolve(_LIBCPPSHARED, "util_destroy_utf16"))(utf16); }
+void util_destroy_utf8(char* utf8) { return _symbol(_SYMBOLS.util_destroy_utf8)(utf8); }
+void util_destroy_utf16(char16_t* utf16) { return _symbol(_SYMBOLS.util_destroy_utf16)(utf16); }
 void util_utf8_to_utf16(const char* utf8, char16_t** utf16, size_t* errType) {
-    _checklibs(); return ((void(*)(const char*, char16_t**, size_t*))_resolve(_LIBCPPSHARED, "util_utf8_to_utf16"))(utf8, utf16, errType); }
+    return _symbol(_SYMBOLS.util_utf8_to_utf16)(utf8, utf16, errType); }
 void util_utf16_to_utf8(const char16_t* utf16, char** utf8, size_t* errType) {
-    _checklibs(); return ((void(*)(const char16_t*, char**, size_t*))_resolve(_LIBCPPSHARED, "util_utf16_to_utf8"))(utf16, utf8, errType); }
+    return _symbol(_SYMBOLS.util_utf16_to_utf8)(utf16, utf8, errType); }
 // CPP_SHARED_LIB
 void runtime_create_session(char16_t** options, size_t size) {
-    _checklibs(); return ((void(*)(char16_t**, size_t))_resolve(_LIBCPPSHARED, "runtime_create_session"))(options, size); }
-void runtime_terminate_session() { _checklibs(); return ((void(*)())_resolve(_LIBCPPSHARED, "runtime_terminate_session"))(); }
+    return _symbol(_SYMBOLS.runtime_create_session)(options, size); }
+void runtime_terminate_session() { return _symbol(_SYMBOLS.runtime_terminate_session)(); }
 uint64_t create_mvm_instance_async(const char16_t* name) {
-    _checklibs(); return ((uint64_t(*)(const char16_t*))_resolve(_LIBCPPSHARED, "create_mvm_instance_async"))(name); }
+    return _symbol(_SYMBOLS.create_mvm_instance_async)(name); }
 uint64_t create_mvm_instance(const char16_t* name, bool* errFlag) {
-    _checklibs(); return ((uint64_t(*)(const char16_t*, bool*))_resolve(_LIBCPPSHARED, "create_mvm_instance"))(name, errFlag); }
+    return _symbol(_SYMBOLS.create_mvm_instance)(name, errFlag); }
 void terminate_mvm_instance(const uint64_t mvmHandle) {
-    _checklibs(); return ((void(*)(const uint64_t))_resolve(_LIBCPPSHARED, "terminate_mvm_instance"))(mvmHandle); }
+    return _symbol(_SYMBOLS.terminate_mvm_instance)(mvmHandle); }
 void wait_for_figures_to_close(const uint64_t mvmHandle) {
-    _checklibs(); return ((void(*)(const uint64_t))_resolve(_LIBCPPSHARED, "wait_for_figures_to_close"))(mvmHandle); }
+    return _symbol(_SYMBOLS.wait_for_figures_to_close)(mvmHandle); }
 void cppsharedlib_destroy_handles(uintptr_t* handles) {
-    _checklibs(); return ((void(*)(uintptr_t*))_resolve(_LIBCPPSHARED, "cppsharedlib_destroy_handles"))(handles); }
+    return _symbol(_SYMBOLS.cppsharedlib_destroy_handles)(handles); }
 uintptr_t cppsharedlib_feval_with_completion(const uint64_t matlabHandle, const char* function, size_t nlhs, bool scalar,
                                              matlab::data::impl::ArrayImpl** args, size_t nrhs,
                                              void(*success)(void*, size_t, bool, matlab::data::impl::ArrayImpl**),
                                              void(*exception)(void*, size_t, bool, size_t, const void*),
                                              void* p, void* output, void* error, void(*write)(void*, const char16_t*, size_t),
                                              void(*deleter)(void*)) {
-    _checklibs();
-    return ((uintptr_t(*)(const uint64_t, const char*, size_t, bool, matlab::data::impl::ArrayImpl**, size_t,
-                          void(*)(void*, size_t, bool, matlab::data::impl::ArrayImpl**),
-                          void(*)(void*, size_t, bool, size_t, const void*), void*, void*, void*,
-                          void(*)(void*, const char16_t*, size_t), void(*)(void*)))_resolve(_LIBCPPSHARED, "cppsharedlib_feval_with_completion"))
-                          (matlabHandle, function, nlhs, scalar, args, nrhs, success, exception, p, output, error, write, deleter);
+    return _symbol(_SYMBOLS.cppsharedlib_feval_with_completion)
+        (matlabHandle, function, nlhs, scalar, args, nrhs, success, exception, p, output, error, write, deleter);
 }
 bool cppsharedlib_cancel_feval_with_completion(uintptr_t taskHandle, bool allowInteruption) {
-    _checklibs(); return ((bool(*)(uintptr_t, bool))_resolve(_LIBCPPSHARED, "cppsharedlib_cancel_feval_with_completion"))(taskHandle, allowInteruption); }
+    return _symbol(_SYMBOLS.cppsharedlib_cancel_feval_with_completion)(taskHandle, allowInteruption); }
 void cppsharedlib_destroy_task_handle(uintptr_t taskHandle) {
-    _checklibs(); return ((void(*)(uintptr_t))_resolve(_LIBCPPSHARED, "cppsharedlib_destroy_task_handle"))(taskHandle); }
+    return _symbol(_SYMBOLS.cppsharedlib_destroy_task_handle)(taskHandle); }
 size_t cppsharedlib_get_stacktrace_number(const uintptr_t frameHandle) {
-    _checklibs(); return ((size_t(*)(const uintptr_t))_resolve(_LIBCPPSHARED, "cppsharedlib_get_stacktrace_number"))(frameHandle); }
+    return _symbol(_SYMBOLS.cppsharedlib_get_stacktrace_number)(frameHandle); }
 const char* cppsharedlib_get_stacktrace_message(const uintptr_t frameHandle) {
-    _checklibs(); return ((const char*(*)(const uintptr_t))_resolve(_LIBCPPSHARED, "cppsharedlib_get_stacktrace_message"))(frameHandle); }
+    return _symbol(_SYMBOLS.cppsharedlib_get_stacktrace_message)(frameHandle); }
 const char16_t* cppsharedlib_get_stackframe_file(const uintptr_t frameHandle, size_t frameNumber) {
-    _checklibs(); return ((const char16_t*(*)(const uintptr_t, size_t))_resolve(_LIBCPPSHARED, "cppsharedlib_get_stackframe_file"))(frameHandle, frameNumber); }
+    return _symbol(_SYMBOLS.cppsharedlib_get_stackframe_file)(frameHandle, frameNumber); }
 const char* cppsharedlib_get_stackframe_func(const uintptr_t frameHandle, size_t frameNumber) {
-    _checklibs(); return ((const char*(*)(const uintptr_t, size_t))_resolve(_LIBCPPSHARED, "cppsharedlib_get_stackframe_func"))(frameHandle, frameNumber); }
+    return _symbol(_SYMBOLS.cppsharedlib_get_stackframe_func)(frameHandle, frameNumber); }
 uint64_t cppsharedlib_get_stackframe_line(const uintptr_t frameHandle, size_t frameNumber) {
-    _checklibs(); return ((uint64_t(*)(const uintptr_t, size_t))_resolve(_LIBCPPSHARED, "cppsharedlib_get_stackframe_line"))(frameHandle, frameNumber); }
+    return _symbol(_SYMBOLS.cppsharedlib_get_stackframe_line)(frameHandle, frameNumber); }
 int cppsharedlib_run_main(int(*mainfcn)(int, const char**), int argc, const char** argv) {
-    _checklibs(); return ((int(*)(int(*)(int, const char**), int, const char**))_resolve(_LIBCPPSHARED, "cppsharedlib_run_main"))(mainfcn, argc, argv); }
+    return _symbol(_SYMBOLS.cppsharedlib_run_main)(mainfcn, argc, argv); }
 // DATA_ARRAY
-void* get_function_ptr(int fcn) { _checklibs(); return ((void*(*)(int))_resolve(_LIBDATAARRAY, "get_function_ptr"))(fcn); }
+void* get_function_ptr(int fcn) { return _symbol(_SYMBOLS.get_function_ptr)(fcn); }
 // MEX
-void* mexGetFunctionImpl() { _checklibs(); return ((void*(*)())_resolve(_LIBMEX, "mexGetFunctionImpl"))(); }
-void mexDestroyFunctionImpl(void* impl) { _checklibs(); return ((void(*)(void*))_resolve(_LIBMEX, "mexDestroyFunctionImpl"))(impl); }
-
+void* mexGetFunctionImpl() { return _symbol(_SYMBOLS.mexGetFunctionImpl)(); }
+void mexDestroyFunctionImpl(void* impl) { return _symbol(_SYMBOLS.mexDestroyFunctionImpl)(impl); }
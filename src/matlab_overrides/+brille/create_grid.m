@@ -3,11 +3,12 @@ classdef create_grid < pyclasswrapper
     methods
         % Constructor
         function obj = create_grid(varargin)
-            obj.pyObjectString = call('_call_python', 'create_grid', varargin{:}); 
+            [obj.pyObjectString, obj.immutable] = call('_call_python', 'create_grid', varargin{:});
             obj.overrides = [obj.overrides {'fill', 'ir_interpolate_at'}];
         end
         function out = fill(obj, varargin)
             % Ensures inputs are the correct type and shape.
+            obj.invalidate_cache();
             call('_call_python', 'brille_grid_fill', obj.pyObjectString, varargin{:});
             out = [];
         end
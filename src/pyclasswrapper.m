@@ -3,7 +3,12 @@ classdef pyclasswrapper < handle
         pyObjectString
     end
     properties(Access=protected)
-        overrides = {'pyObjectString'};
+        overrides = {'pyObjectString', 'call_methods', 'get_props'};
+        % Names of the properties the Python object declares immutable, which subclasses set
+        % with the handle when the object is created (see WrappedPythonClass in
+        % FunctionWrapper.py), and their values once read
+        immutable = {};
+        prop_cache = [];
     end
     methods
         function delete(obj)
@@ -13,6 +18,35 @@ classdef pyclasswrapper < handle
                 end
             end
         end
+        function out = call_methods(obj, varargin)
+            % Calls several methods, each given as a cell {name, args...}, with a
+            % single call to Python and returns a cell array of their results
+            obj.invalidate_cache();
+            out = cell(1, numel(varargin));
+            [out{:}] = call('_call_python', 'call_obj_methods', obj.pyObjectString, varargin{:});
+        end
+        function out = get_props(obj, varargin)
+            % Reads several properties with a single call to Python, as a struct, using
+            % and filling the cache of immutable properties as get_prop does
+            cache = obj.cached_props();
+            is_cached = cellfun(@(name) isKey(cache, name), varargin);
+            fetched = struct();
+            if ~all(is_cached)
+                fetched = call('_call_python', 'get_obj_props', obj.pyObjectString, varargin{~is_cached});
+            end
+            out = struct();
+            for ii = 1:numel(varargin)
+                name = varargin{ii};
+                if is_cached(ii)
+                    out.(name) = cache(name);
+                else
+                    out.(name) = fetched.(name);
+                    if any(strcmp(name, obj.immutable))
+                        cache(name) = out.(name);
+                    end
+                end
+            end
+        end
         function varargout = subsref(obj, s)
             switch s(1).type
                 case '.'
@@ -23,10 +57,11 @@ classdef pyclasswrapper < handle
                             varargout = obj.(s(1).subs);
                         end
                     elseif numel(s) == 1
-                        varargout = call('_call_python', 'get_obj_prop', obj.pyObjectString, s(1).subs);
+                        varargout = obj.get_prop(s(1).subs);
                     elseif s(2).type == '()'
+                        obj.invalidate_cache();
                         varargout = call('_call_python', 'call_obj_method', obj.pyObjectString, s(1).subs, s(2).subs{:});
-                    else 
+                    else
                         error('Python class wrapper only supports calling direct methods');
                     end
                 otherwise
@@ -37,4 +72,32 @@ classdef pyclasswrapper < handle
             end
         end
     end
+    methods(Access=protected)
+        function out = get_prop(obj, name)
+            % Properties declared immutable (in __pace_immutable__ or by WrappedPythonClass)
+            % are only read from Python once
+            cache = obj.cached_props();
+            if isKey(cache, name)
+                out = cache(name);
+                return;
+            end
+            out = call('_call_python', 'get_obj_prop', obj.pyObjectString, name);
+            if any(strcmp(name, obj.immutable))
+                cache(name) = out;
+            end
+        end
+        function cache = cached_props(obj)
+            % The values of the immutable properties read so far
+            if ~isa(obj.prop_cache, 'containers.Map')
+                obj.prop_cache = containers.Map('KeyType', 'char', 'ValueType', 'any');
+            end
+            cache = obj.prop_cache;
+        end
+        function invalidate_cache(obj)
+            % Methods may change the state of the Python object, so cached values are dropped
+            if ~isempty(obj.prop_cache)
+                remove(obj.prop_cache, keys(obj.prop_cache));
+            end
+        end
+    end
 end
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+import time
+import asyncio
+import contextlib
+import threading
+import unittest
+from pace_neutrons import _calls
+from pace_neutrons._calls import call_matlab, MatlabCancelled
+from pace_neutrons._aio import MatlabAsync
+from pace_neutrons._dispatch import DISPATCHER, DispatchedInterface
+
+
+def _cancel_while_finishing(running, ready):
+    # Holds the lock of the call until the thread which made it waits for it to finish the call,
+    # and then cancels it (as if `cancel` had taken the lock first)
+    lock = running._lock
+    with lock:
+        ready.set()
+        time.sleep(0.05)
+        running._lock = contextlib.nullcontext()
+        running.cancel()
+        running._lock = lock
+
+
+class FakeInterface(object):
+    # Stands in for the libpymcr interface. With `cancel`, the call is cancelled just as it
+    # returns, so the interrupt is only raised once MATLAB has finished
+    def __init__(self, cancel=False):
+        self.cancel = cancel
+
+    def call(self, name, *args, nargout=1):
+        if self.cancel:
+            ready = threading.Event()
+            running = _calls._CALLS[threading.get_ident()]
+            threading.Thread(target=_cancel_while_finishing, args=(running, ready)).start()
+            ready.wait()
+        return sum(args)
+
+
+class BlockingInterface(object):
+    # A call which runs until it is released
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def call(self, name, *args, nargout=1):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return sum(args)
+
+
+class MatlabCallTest(unittest.TestCase):
+
+    def test_call(self):
+        self.assertEqual(call_matlab(FakeInterface(), 'plus', (1, 2), {}, 1), 3)
+
+    def test_cancel_as_call_returns(self):
+        with self.assertRaises(MatlabCancelled):
+            call_matlab(FakeInterface(cancel=True), 'plus', (1, 2), {}, 1)
+        # The interrupt has been absorbed rather than raised later
+        for _ in range(100):
+            time.sleep(0.001)
+        self.assertEqual(call_matlab(FakeInterface(), 'plus', (1, 2), {}, 1), 3)
+
+    def test_async_cancel(self):
+        interface = BlockingInterface()
+        aio = MatlabAsync(interface)
+
+        async def run_async():
+            running, queued = aio.plus(1, 2), aio.plus(3, 4)
+            while not interface.started.is_set():
+                await asyncio.sleep(0.01)
+            queued.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await queued
+            # The running call cannot be interrupted, which is warned about rather than ignored
+            running.cancel()
+            with self.assertWarns(RuntimeWarning), self.assertRaises(asyncio.CancelledError):
+                await running
+            interface.release.set()
+            return await aio.plus(5, 6)
+        self.assertEqual(asyncio.run(run_async()), 11)
+
+    def test_async_cancel_while_waiting(self):
+        # A task cancelled while its job waits for a blocking call from another thread cancels
+        # neither that call nor its own, which does not start
+        interface = BlockingInterface()
+        dispatched = DispatchedInterface(interface, DISPATCHER)
+        aio = MatlabAsync(dispatched)
+        results = []
+
+        async def run_async():
+            task = aio.plus(5, 6)
+            await asyncio.sleep(0.2)
+            task.cancel()
+            try:
+                results.append(await task)
+            except asyncio.CancelledError:
+                results.append('cancelled')
+            interface.release.set()
+
+        def run_loop():
+            interface.started.wait(5)
+            asyncio.run(run_async())
+        thread = threading.Thread(target=run_loop)
+        thread.start()
+        self.assertEqual(call_matlab(dispatched, 'plus', (1, 2), {}, 1), 3)
+        thread.join()
+        DISPATCHER.submit(lambda: None).result()
+        self.assertEqual(results, ['cancelled'])
+        self.assertEqual(interface.calls, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+import os
+import tempfile
+import unittest
+from unittest import mock
+from pace_neutrons._discovery import DiscoveryIndex
+
+
+class DiscoveryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.roots = {}
+        for name in ['mlA', 'mlB']:
+            self.roots[name] = os.path.join(self.tmpdir.name, name)
+            os.mkdir(self.roots[name])
+            open(os.path.join(self.roots[name], 'VersionInfo.xml'), 'w').close()
+        self.index_file = os.path.join(self.tmpdir.name, 'discovery.json')
+        self.env = mock.patch.dict(os.environ, {'PACE_MCR_DIR': self.roots['mlA']})
+        self.env.start()
+        os.environ.pop('PACE_NO_DISCOVERY_CACHE', None)
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmpdir.cleanup()
+
+    def _root(self, found):
+        # A new index for each call, as in a new session
+        index = DiscoveryIndex(self.index_file)
+        with mock.patch('libpymcr.utils.checkPath', return_value=found) as check_path:
+            root = index.matlab_root('2021b')
+        index.save()
+        return root, check_path.call_count
+
+    def test_cached_root(self):
+        self.assertEqual(self._root(self.roots['mlA']), (self.roots['mlA'], 1))
+        self.assertEqual(self._root(self.roots['mlA']), (self.roots['mlA'], 0))
+
+    def test_environment_change(self):
+        self.assertEqual(self._root(self.roots['mlA']), (self.roots['mlA'], 1))
+        os.environ['PACE_MCR_DIR'] = self.roots['mlB']
+        self.assertEqual(self._root(self.roots['mlB']), (self.roots['mlB'], 1))
+
+    def test_library_path_restored(self):
+        def check_path(*args, **kwargs):
+            os.environ['LD_LIBRARY_PATH'] = os.path.join(self.roots['mlA'], 'runtime')
+            return self.roots['mlA']
+        os.environ.pop('LD_LIBRARY_PATH', None)
+        index = DiscoveryIndex(self.index_file)
+        with mock.patch('libpymcr.utils.checkPath', side_effect=check_path):
+            index.matlab_root('2021b')
+        index.save()
+        os.environ.pop('LD_LIBRARY_PATH')
+        self.assertEqual(self._root(None), (self.roots['mlA'], 0))
+        self.assertEqual(os.environ['LD_LIBRARY_PATH'], os.path.join(self.roots['mlA'], 'runtime'))
+
+    def test_unstamped_root(self):
+        os.remove(os.path.join(self.roots['mlA'], 'VersionInfo.xml'))
+        self.assertEqual(self._root(self.roots['mlA']), (self.roots['mlA'], 1))
+        self.assertEqual(self._root(self.roots['mlA']), (self.roots['mlA'], 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import time
+import threading
+import unittest
+from pace_neutrons._dispatch import MatlabDispatcher, DispatchedInterface
+
+
+class FakeInterface(object):
+    # Stands in for the libpymcr interface, recording the calls and checking they do not overlap
+    def __init__(self):
+        self.calls = []
+        self.running = False
+
+    def call(self, name, *args, nargout=1):
+        if name == 'feval':
+            # Calls the Python function back on a thread of its own, as MATLAB does
+            results = []
+            thread = threading.Thread(target=lambda: results.append(args[0](*args[1:])))
+            thread.start()
+            thread.join(2)
+            return results[0] if results else None
+        assert not self.running, 'MATLAB calls overlap'
+        self.running = True
+        time.sleep(0.05)
+        self.calls.append(name)
+        self.running = False
+        return args[0] if args else None
+
+
+class MatlabDispatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = MatlabDispatcher()
+        self.interface = DispatchedInterface(FakeInterface(), self.dispatcher)
+
+    def test_threads_are_serialised(self):
+        results = []
+        threads = [threading.Thread(target=lambda i=i: results.append(self.interface.call('f', i)))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), list(range(8)))
+        self.assertEqual(self.dispatcher.stats()['interactive']['calls'], 8)
+
+    def test_interactive_calls_go_first(self):
+        with self.dispatcher.priority('batch'):
+            futures = [self.dispatcher.submit(self.interface.call, f'batch{i}') for i in range(3)]
+        futures.append(self.dispatcher.submit(self.interface.call, 'interactive', priority='interactive'))
+        for future in futures:
+            future.result()
+        # The first batch call may already be running when the interactive call is queued
+        self.assertLessEqual(self.interface._interface.calls.index('interactive'), 1)
+        self.assertGreater(futures[-1].timing.run_time, 0)
+
+    def test_nested_calls_pass_through(self):
+        result = self.dispatcher.run(lambda: self.interface.call('g', self.interface.call('f', 1)))
+        self.assertEqual(result, 1)
+
+    def test_callbacks_pass_through(self):
+        self.assertEqual(self.interface.call('feval', lambda x: self.interface.call('f', x), 1), 1)
+
+    def test_other_threads_wait(self):
+        started, release = threading.Event(), threading.Event()
+
+        def hold():
+            started.set()
+            release.wait(2)
+        holder = threading.Thread(target=self.dispatcher.run, args=(hold,))
+        holder.start()
+        started.wait()
+        other = threading.Thread(target=self.interface.call, args=('f', 1))
+        other.start()
+        other.join(0.2)
+        # A thread which is not called back from the running call waits for it
+        self.assertTrue(other.is_alive())
+        release.set()
+        holder.join()
+        other.join()
+        self.assertEqual(self.interface._interface.calls, ['f'])
+
+    def test_unknown_priority(self):
+        with self.assertRaises(ValueError):
+            self.dispatcher.submit(self.interface.call, 'f', priority='urgent')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import tempfile
+import unittest
+import subprocess
+
+# Maximum time for `import pace_neutrons` in seconds (can be overridden for slow machines)
+IMPORT_BUDGET = float(os.environ.get('PACE_IMPORT_BUDGET', 0.2))
+
+_IMPORT_SCRIPT = '''
+import sys, time, json
+t0 = time.perf_counter()
+import pace_neutrons
+dt = time.perf_counter() - t0
+print(json.dumps({'seconds': dt, 'modules': sorted(sys.modules)}))
+'''
+
+
+def _time_import(config_dir):
+    # Each import is done in a new interpreter so nothing is already loaded. The discovery index
+    # is written to a temporary config directory (XDG_CONFIG_HOME) rather than the user's, or
+    # not at all where appdirs does not take the directory from the environment.
+    env = dict(os.environ, XDG_CONFIG_HOME=config_dir)
+    if sys.platform in ('win32', 'darwin'):
+        env['PACE_NO_DISCOVERY_CACHE'] = '1'
+    out = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT], check=True, env=env,
+                         stdout=subprocess.PIPE, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return json.loads(out.stdout.decode().splitlines()[-1])
+
+
+class PaceImportTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # The first import can be slower as the CTF listing is cached then
+        with tempfile.TemporaryDirectory() as config_dir:
+            _time_import(config_dir)
+            cls.results = [_time_import(config_dir) for _ in range(3)]
+
+    def test_import_is_lazy(self):
+        modules = self.results[0]['modules']
+        for heavy in ['libpymcr', 'numpy', 'brille', 'pace_neutrons._matlab', 'pace_neutrons.FunctionWrapper']:
+            self.assertNotIn(heavy, modules)
+
+    def test_import_time(self):
+        best = min(r['seconds'] for r in self.results)
+        print(f'Time to import pace_neutrons: {best}s')
+        self.assertLess(best, IMPORT_BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+import unittest
+import numpy as np
+from pace_neutrons import FunctionWrapper
+
+
+class ObjectRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        FunctionWrapper.remove_objects()
+
+    def test_add_get_remove(self):
+        data = np.zeros(1000)
+        key = FunctionWrapper.add_object(data, 'pyobj_test')
+        self.assertTrue(key.startswith('pyobj_test'))
+        self.assertIs(FunctionWrapper.get_object(key), data)
+        self.assertEqual(FunctionWrapper.stats()['live'], 1)
+        self.assertGreaterEqual(FunctionWrapper.stats()['bytes'], data.nbytes)
+        FunctionWrapper.remove_object(key)
+        self.assertEqual(FunctionWrapper.stats()['live'], 0)
+        # Removing twice is harmless
+        FunctionWrapper.remove_object(key)
+
+    def test_stale_handles(self):
+        key = FunctionWrapper.add_object('first')
+        FunctionWrapper.remove_object(key)
+        new_key = FunctionWrapper.add_object('second')
+        # The slot is reused but the old handle does not refer to the new object
+        self.assertEqual(key.split('#')[1], new_key.split('#')[1])
+        with self.assertRaises(KeyError):
+            FunctionWrapper.get_object(key)
+        self.assertEqual(FunctionWrapper.get_object(new_key), 'second')
+
+    def test_table_grows(self):
+        keys = [FunctionWrapper.add_object(ii) for ii in range(200)]
+        self.assertEqual([FunctionWrapper.get_object(key) for key in keys], list(range(200)))
+        FunctionWrapper.remove_objects(*keys[:100])
+        self.assertEqual(FunctionWrapper.stats()['live'], 100)
+        FunctionWrapper.remove_objects()
+        self.assertEqual(FunctionWrapper.stats()['live'], 0)
+
+    def test_wrapped_class(self):
+        FunctionWrapper.libpymcr._globalFunctionDict['test_dict'] = FunctionWrapper.WrappedPythonClass(dict, 'pyobj_dict')
+        FunctionWrapper.libpymcr._globalFunctionDict['test_list'] = FunctionWrapper.WrappedPythonClass(list, 'pyobj_list')
+        inner, _ = FunctionWrapper.call_python_columns('test_dict', a=1)
+        # Wrapped objects passed from Matlab, as markers listed by position and keyword
+        outer, _ = FunctionWrapper.call_python_columns('test_dict', inner={'pace_pyobj': inner},
+                                                    pace_pyobj_args=np.zeros((1, 0), np.int64), pace_pyobj_kwargs='inner')
+        self.assertEqual(FunctionWrapper.call_obj_method(outer, 'get', 'inner'), {'a': 1})
+        items, _ = FunctionWrapper.call_python_columns('test_list', {'pace_pyobj': inner}, pace_pyobj_args=np.int64(0))
+        self.assertEqual(FunctionWrapper.call_obj_method(items, 'copy'), ['a'])
+        # Strings are passed through untouched, even if they look like handles
+        strings, _ = FunctionWrapper.call_python_columns('test_list', inner)
+        self.assertEqual(FunctionWrapper.get_object(strings), list(inner))
+
+    def test_arguments(self):
+        FunctionWrapper.libpymcr._globalFunctionDict['test_args'] = lambda *args, **kwargs: (args, kwargs)
+        column, row = np.zeros((3, 1)), np.zeros((1, 3))
+        args, kwargs = FunctionWrapper.call_python_columns('test_args', column, 'x', y=column)
+        # Arguments with nothing to convert are passed on as they are
+        self.assertIs(args[0], column)
+        self.assertIs(kwargs['y'], column)
+        args, kwargs = FunctionWrapper.call_python_columns('test_args', row, y=row)
+        self.assertEqual(np.shape(args[0]), (3, 1))
+        self.assertEqual(np.shape(kwargs['y']), (3, 1))
+
+    def test_method_calls(self):
+        key = FunctionWrapper.add_object([3, 1, 2])
+        FunctionWrapper.call_obj_method(key, 'sort')
+        self.assertEqual(FunctionWrapper.call_obj_methods(key, ['index', 2], ['count', 1], 'copy'), [1, 1, [1, 2, 3]])
+        # The cached methods are dropped with the object, so a new object in the slot uses its own
+        FunctionWrapper.remove_object(key)
+        new_key = FunctionWrapper.add_object([5])
+        self.assertEqual(FunctionWrapper.call_obj_method(new_key, 'copy'), [5])
+        with self.assertRaises(KeyError):
+            FunctionWrapper.call_obj_method(key, 'copy')
+
+    def test_properties(self):
+        class Lattice(object):
+            __pace_immutable__ = ('a',)
+            def __init__(self):
+                self.a, self.b = 1, 2
+        # The immutable properties are returned with the handle of a new object
+        key, immutable = FunctionWrapper.WrappedPythonClass(Lattice, 'pyobj_lattice', immutable=['b'])()
+        self.assertEqual(immutable, ['a', 'b'])
+        self.assertEqual(FunctionWrapper.get_obj_props(key, 'a', 'b'), {'a': 1, 'b': 2})
+        self.assertEqual(FunctionWrapper.get_obj_immutable(FunctionWrapper.add_object([])), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import os
+import unittest
+from pace_neutrons import MatlabPool, MatlabBlob
+
+
+class FakeMatlab(object):
+    # Stands in for the MATLAB session of each worker, so the pool can be tested without the MCR
+    def __init__(self, matlab_path=None, matlab_version=None):
+        self.matlab_version = matlab_version
+        self.n_calls = 0
+
+    def plus(self, a, b, nargout=1):
+        self.n_calls += 1
+        return a + b
+
+    def session(self, nargout=1):
+        self.n_calls += 1
+        return os.getpid(), id(self), self.n_calls
+
+    def error(self, message, nargout=0):
+        raise RuntimeError(message)
+
+    def keep(self, nargout=1):
+        # A result kept in MATLAB, which the worker must serialise
+        from pace_neutrons._calls import MatlabHandle
+        return [MatlabHandle(None, 'kept')]
+
+    def getByteStreamFromArray(self, value, nargout=1):
+        import numpy as np
+        return np.frombuffer(value.handle.encode(), dtype=np.uint8)
+
+    def getArrayFromByteStream(self, stream, nargout=1, return_handle=None):
+        return stream.tobytes().decode(), return_handle
+
+    def class_(self, value, nargout=1):
+        return 'double'
+
+
+class MatlabPoolTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = MatlabPool(2, matlab_version='2021b', backend=FakeMatlab)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_submit(self):
+        self.assertEqual(self.pool.submit('plus', 1, 2).result(), 3)
+
+    def test_map(self):
+        self.assertEqual(list(self.pool.map('plus', range(20), range(20))), list(range(0, 40, 2)))
+        self.assertEqual(list(self.pool.map('plus', [], [])), [])
+
+    def test_workers_are_reused(self):
+        sessions = [future.result() for future in [self.pool.submit('session') for _ in range(10)]]
+        self.assertLessEqual(len({pid for pid, _, _ in sessions}), 2)
+        # Each worker process creates its session once
+        self.assertEqual(len({(pid, obj) for pid, obj, _ in sessions}), len({pid for pid, _, _ in sessions}))
+        self.assertNotIn(os.getpid(), [pid for pid, _, _ in sessions])
+
+    def test_errors_are_raised(self):
+        with self.assertRaisesRegex(RuntimeError, 'bad input'):
+            self.pool.submit('error', 'bad input').result()
+        # The worker is still usable after an error
+        self.assertEqual(self.pool.submit('plus', 2, 2).result(), 4)
+
+    def test_handles_are_serialised(self):
+        blob = self.pool.submit('keep').result()[0]
+        self.assertIsInstance(blob, MatlabBlob)
+        self.assertTrue(blob.handle)
+        self.assertEqual(blob.load(FakeMatlab()), ('kept', True))
+
+    def test_shutdown(self):
+        with MatlabPool(1, backend=FakeMatlab) as pool:
+            future = pool.submit('plus', 1, 1)
+        self.assertEqual(future.result(), 2)
+        with self.assertRaises(RuntimeError):
+            pool.submit('plus', 1, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
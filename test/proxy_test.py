@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import unittest
+from collections.abc import Mapping
+from pace_neutrons._proxy import LazyMatlabObject
+
+
+class FakeInterface(object):
+    # Stands in for the libpymcr interface, with objects and structs kept as dicts by handle
+    def __init__(self, values):
+        self.values = values
+
+    def call(self, name, *args, nargout=1):
+        if name == '_describe':
+            value = self.values[args[0]]
+            return ['struct' if args[0].startswith('s') else 'sqw', list(value), [], False]
+        elif name == '_get_property':
+            value = self.values[args[0]][args[1]]
+            return [isinstance(value, str) and value.startswith('s'), value]
+        elif name == '_set_property':
+            handle = args[0] + "'"
+            self.values[handle] = dict(self.values[args[0]], **{args[1]: args[2]})
+            return handle
+        raise NotImplementedError(name)
+
+
+class LazyMatlabStructTest(unittest.TestCase):
+
+    def setUp(self):
+        self.interface = FakeInterface({'w': {'data': 's1'}, 's1': {'s': 1., 'e': 2., 'keys': 3.}})
+        self.w = LazyMatlabObject(self.interface, 'w')
+
+    def test_struct_as_mapping(self):
+        data = self.w.data
+        self.assertEqual(data.s, 1.)
+        self.assertEqual(data['e'], 2.)
+        self.assertIsInstance(data, Mapping)
+        self.assertEqual(list(data.keys()), ['s', 'e', 'keys'])
+        self.assertEqual(list(data), ['s', 'e', 'keys'])
+        self.assertEqual(len(data), 3)
+        self.assertIn('s', data)
+        self.assertEqual(dict(data.items()), {'s': 1., 'e': 2., 'keys': 3.})
+        self.assertEqual(data['keys'], 3.)
+        self.assertIsNone(data.get('x'))
+        with self.assertRaises(KeyError):
+            data['x']
+
+    def test_val_is_a_dict(self):
+        # As for the DictPropertyWrapper which structs were returned as before
+        self.assertIsInstance(self.w.data.val, dict)
+        self.assertEqual(self.w.data.val, {'s': 1., 'e': 2., 'keys': 3.})
+
+    def test_set_field(self):
+        self.w.data['s'] = 5.
+        self.assertEqual(self.w.data['s'], 5.)
+        self.assertEqual(self.interface.values[self.w.handle]['data'], self.w.data.handle)
+
+
+if __name__ == '__main__':
+    unittest.main()
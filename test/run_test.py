@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import time
 import unittest
 import numpy as np
 
@@ -70,6 +71,79 @@ class PacePythonTest(unittest.TestCase):
         self.wsc = self.m.cut_sqw('demo/datafiles/quartz_cut.sqw', [-3.02, -2.98], [5, 0.5, 38])
 
 
+    def test0_MatlabSingleton(self):
+        from pace_neutrons import Matlab
+        self.assertIs(Matlab(), self.m)
+
+    def test0_FunctionHandle(self):
+        # MATLAB function handles are called with the handle in place of a function name
+        sin = self.m.str2func('sin')
+        self.assertAlmostEqual(sin(0.5), np.sin(0.5))
+        square = self.m.eval('@(x) x.^2')
+        self.assertEqual(square(3.0), 9.0)
+
+    def test0_Batch(self):
+        with self.m.batch() as b:
+            x = b.plus(1, 2)
+            y = b.plus(x, 10)
+        self.assertEqual(y.result(), 13)
+        results = self.m.batch([('plus', (1, 2)), ('error', ('pace:test', 'bad input')), ('minus', (3, 1))])
+        self.assertEqual(results[0], 3)
+        self.assertEqual(results[1].identifier, 'pace:test')
+        self.assertEqual(results[2], 2)
+
+    def test0_Async(self):
+        import asyncio
+        async def run_async():
+            # The event loop runs while MATLAB is busy
+            ticks = 0
+            task = asyncio.ensure_future(self.m.aio.pause(1, nargout=0))
+            while not task.done():
+                await asyncio.sleep(0.1)
+                ticks += 1
+            # A running call cannot be interrupted from the dispatcher thread, which is warned about
+            with self.assertWarns(RuntimeWarning), self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(self.m.aio.pause(1, nargout=0), 0.2)
+            return ticks, await self.m.aio.plus(1, 2)
+        ticks, result = asyncio.run(run_async())
+        self.assertGreater(ticks, 1)
+        self.assertEqual(result, 3)
+
+    def test0_Timeout(self):
+        from pace_neutrons import MatlabTimeout
+        t0 = time.time()
+        with self.assertRaises(MatlabTimeout):
+            self.m.pause(10, nargout=0, timeout=0.5)
+        self.assertLess(time.time() - t0, 5)
+        # The session is still usable after the call was interrupted
+        self.assertEqual(self.m.plus(1, 2, timeout=10), 3)
+
+    def test0_ReturnHandle(self):
+        from pace_neutrons import MatlabHandle
+        data = self.m.rand(1000, 1000, return_handle=True)
+        self.assertIsInstance(data, MatlabHandle)
+        self.assertEqual(self.m.numel(data), 1000000)
+        self.assertEqual(np.shape(data.fetch()), (1000, 1000))
+        self.m.keep_results(1000)
+        try:
+            self.assertIsInstance(self.m.zeros(100, 100), MatlabHandle)
+            self.assertEqual(self.m.plus(1, 2), 3)
+        finally:
+            self.m.keep_results(None)
+
+    def test0_Dispatcher(self):
+        import threading
+        results = []
+        threads = [threading.Thread(target=lambda i=i: results.append(self.m.plus(i, 1))) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        future = self.m.submit('plus', 1, 2, priority='batch')
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(results), [1, 2, 3, 4])
+        self.assertEqual(future.result(), 3)
+        self.assertGreaterEqual(future.timing.queue_wait, 0)
+
     def test0_CutSqwDnd(self):
         proj = self.m.projaxes([1, 0, 0], [0, 1, 0], 'type', 'rrr')
         w1 = self.m.cut_sqw('demo/datafiles/pcsmo_cut1.sqw', proj,
@@ -90,6 +164,54 @@ class PacePythonTest(unittest.TestCase):
         w3 = w2.cut([0.45, 0.55], [5, 1, 65], '-nopix')
         self.assertEqual(np.shape(w3.s), (61, 1))
 
+    def test0_LazyProxy(self):
+        from pace_neutrons._proxy import LazyMatlabObject
+        proj = self.m.projaxes([1, 0, 0], [0, 1, 0], 'type', 'rrr')
+        w2 = self.m.cut_sqw('demo/datafiles/pcsmo_cut2.sqw', proj,
+                            [-1, 0.05, 1], [-0.2, 0.2], [-10, 10], [5, 1, 65])
+        self.assertIsInstance(w2, LazyMatlabObject)
+        # Properties are fetched once and cached
+        signal = w2.data.s
+        self.assertIs(w2.data.s, signal)
+        self.assertIn('data', dir(w2))
+
+    def test0_WrapSqwBenchmark(self):
+        # Returning an sqw object should not rescan its members on every call
+        proj = self.m.projaxes([1, 0, 0], [0, 1, 0], 'type', 'rrr')
+        w2 = self.m.cut_sqw('demo/datafiles/pcsmo_cut2.sqw', proj,
+                            [-1, 0.05, 1], [-0.2, 0.2], [-10, 10], [5, 1, 65])
+        t0 = time.perf_counter()
+        w = self.m.deal(w2)
+        t_first = time.perf_counter() - t0
+        n_scans = self.m._interface.call('_wrap_scans', nargout=1)
+        n_calls = 20
+        t0 = time.perf_counter()
+        for _ in range(n_calls):
+            w = self.m.deal(w2)
+        t_cached = (time.perf_counter() - t0) / n_calls
+        print(f'Time to return an sqw object: {t_first}s (first), {t_cached}s (cached)')
+        self.assertEqual(np.shape(w.data.s), np.shape(w2.data.s))
+        # The members of each class are only scanned the first time it is returned
+        self.assertEqual(self.m._interface.call('_wrap_scans', nargout=1), n_scans)
+
+    def test0_CallbackBenchmark(self):
+        # Row vectors from Matlab should reach Python as column vectors without a copy
+        shapes = []
+        def py_callback(x):
+            shapes.append(np.shape(x))
+            return np.sum(x)
+        call_with_ones = self.m.eval('@(f, n) f(ones(1, n))')
+        for n_elem in [10**6, 10**7, 10**8]:
+            self.m.feval(call_with_ones, py_callback, n_elem)  # warm up
+            n_calls = 5
+            t0 = time.perf_counter()
+            for _ in range(n_calls):
+                total = self.m.feval(call_with_ones, py_callback, n_elem)
+            t_call = (time.perf_counter() - t0) / n_calls
+            print(f'Callback with {n_elem} elements: {t_call}s ({n_elem / t_call:.3g} elements/s)')
+            self.assertEqual(total, n_elem)
+            self.assertEqual(shapes[-1], (n_elem, 1))
+
     def test0_FeSetup(self):
         # Make a cut of the data
         self.setup_fe_data()
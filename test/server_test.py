@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+import os
+import stat
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import numpy as np
+from pace_neutrons import MatlabClient
+from pace_neutrons_cli.server import serve
+from pace_neutrons._transport import runtime_dir, write_key, read_key
+
+
+class FakeMatlab(object):
+    # Stands in for the MATLAB session of the server, so it can be tested without the MCR
+    def plus(self, a, b, nargout=1):
+        return a + b
+
+    def transpose(self, a, nargout=1):
+        return np.asfortranarray(a.T)
+
+    def error(self, message, nargout=0):
+        raise RuntimeError(message)
+
+
+class MatlabServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.address = os.path.join(tempfile.mkdtemp(), 'server.sock')
+        threading.Thread(target=serve, args=(FakeMatlab(), cls.address, b'test'), daemon=True).start()
+        for _ in range(100):
+            if os.path.exists(cls.address):
+                break
+            threading.Event().wait(0.05)
+        cls.m = MatlabClient(cls.address, b'test')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.m.close()
+
+    def test_call(self):
+        self.assertEqual(self.m.plus(1, 2), 3)
+
+    def test_large_arrays(self):
+        # Arrays above the threshold are passed in shared memory, keeping their layout
+        data = np.random.rand(500, 300)
+        result = self.m.transpose(data)
+        np.testing.assert_array_equal(result, data.T)
+        self.assertTrue(result.flags.f_contiguous)
+
+    def test_errors_are_raised(self):
+        with self.assertRaisesRegex(RuntimeError, 'bad input'):
+            self.m.error('bad input', nargout=0)
+        self.assertEqual(self.m.plus(2, 2), 4)
+
+    def test_clients_share_the_server(self):
+        with MatlabClient(self.address, b'test') as other:
+            self.assertEqual(other.plus(1, 1), 2)
+        self.assertEqual(self.m.plus(1, 1), 2)
+
+
+class KeyFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.keyfile = os.path.join(tempfile.mkdtemp(), 'server.sock.key')
+
+    @unittest.skipIf(os.name == 'nt', 'POSIX permissions')
+    def test_key_file(self):
+        write_key(self.keyfile, b'secret')
+        self.assertEqual(stat.S_IMODE(os.stat(self.keyfile).st_mode), 0o600)
+        self.assertEqual(read_key(self.keyfile), b'secret')
+        # A key file which is left over is replaced
+        write_key(self.keyfile, b'other')
+        self.assertEqual(read_key(self.keyfile), b'other')
+
+    @unittest.skipIf(os.name == 'nt', 'POSIX permissions')
+    def test_readable_key_file_is_refused(self):
+        write_key(self.keyfile, b'secret')
+        os.chmod(self.keyfile, 0o644)
+        with self.assertRaises(PermissionError):
+            read_key(self.keyfile)
+
+    @unittest.skipIf(os.name == 'nt', 'POSIX permissions')
+    def test_runtime_dir(self):
+        with mock.patch.dict(os.environ, {'XDG_RUNTIME_DIR': os.path.dirname(self.keyfile)}):
+            path = runtime_dir()
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o700)
+            os.chmod(path, 0o755)
+            with self.assertRaises(PermissionError):
+                runtime_dir()
+
+
+class ServerMainTest(unittest.TestCase):
+
+    def test_matlab_dir(self):
+        import pace_neutrons
+        from pace_neutrons_cli import server
+        matlab = mock.Mock()
+        with mock.patch.object(server, 'set_env', lambda: os.environ.update(PACE_MCR_VERSION='R2021b')), \
+                mock.patch.object(server, 'serve') as serve_, \
+                mock.patch.dict(pace_neutrons.__dict__, {'Matlab': matlab}), \
+                mock.patch.dict(os.environ):
+            server.main(['-d', '/opt/mcr', '-a', 'test.sock'])
+            self.assertEqual(os.environ['PACE_MCR_DIR'], '/opt/mcr')
+        matlab.assert_called_once_with(matlab_path='/opt/mcr', matlab_version='2021b')
+        serve_.assert_called_once_with(matlab.return_value, 'test.sock')
+
+
+if __name__ == '__main__':
+    unittest.main()